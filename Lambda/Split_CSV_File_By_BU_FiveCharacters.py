@@ -1,16 +1,59 @@
-import pandas as pd
 import boto3
 import os
 import logging
 import sys
-import io
-from io import StringIO
-from s3_upload import s3_upload
+from concurrent.futures import ThreadPoolExecutor
 from get_tags_from_file import get_tags_from_file
-from add_tags_to_s3_object import add_tags_to_s3_object
+from csv_frame import read_csv_frame
+from s3_multipart_upload import S3MultipartWriter
+from partition_spec import parse_partition_spec, compute_partition_keys, build_partition_output_key
+from split_output_formats import (OUTPUT_FORMAT_XLSX, normalize_output_format, get_output_extension,
+                                  get_output_content_type, write_frame)
+
+# Number of split files serialized and uploaded at the same time.
+SPLIT_UPLOAD_WORKERS = 8
+
+def upload_split_partition(s3_client, bucket_name, output_key, value, value_df, split_file_tags, output_format=OUTPUT_FORMAT_XLSX, partition=None):
+    """
+    Writes one split partition in the output format, uploads it and tags it with its BU.
+    Never raises; returns the partition's manifest entry with 'Status' Success or Failed.
+
+    :param partition: Values of the levels after BU ({column: value}) for multi-level splits, else None.
+                      They are part of output_key and recorded in the manifest, not tagged: the split files
+                      already carry the 10 tags S3 allows per object.
+    """
+    entry = {"BU": str(value), "Partition": partition, "Key": output_key, "Rows": len(value_df), "Status": "Success", "Error": None}
+    try:
+        # Specify BU Tag. Each worker gets its own copy of the tags.
+        partition_tags = dict(split_file_tags, BU=value)
+
+        # Stream the file to the specified S3 bucket as it is written; parts are uploaded while
+        # the rest of the partition is still being serialized. The tags are set by the same upload.
+        with S3MultipartWriter(bucket_name, output_key, content_type=get_output_content_type(output_format), tags=partition_tags, client=s3_client) as writer:
+            write_frame(value_df, writer, output_format)
+
+        # Log the upload status.
+        print(f"Split file '{output_key}' created successfully for value '{value}' with tags {partition_tags}.")
+    except Exception as e:
+        entry["Status"] = "Failed"
+        entry["Error"] = str(e)
+    return entry
 
 #Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key,'BUSINESS_UNIT_AS_BUSINESS_UNIT')
-def Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key, column_name):
+def Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key, column_name, df=None, output_format=None):
+    """
+    Writes the conversion file to DataValidation as one file for all rows and one per partition.
+    Files are uploaded and tagged concurrently.
+
+    :param column_name: Partition spec from extractefieldbu (see partition_spec). A plain column name
+                        splits by its first 5 characters; "BUSINESS_UNIT, ACCOUNTING_DT:month" splits by
+                        BU and month in the same pass into BU folders.
+
+    :param df: Frame already read by an earlier stage of the same invocation (all columns str).
+               When None the file is read from S3.
+    :param output_format: xlsx, csv.gz or parquet (see split_output_formats). None uses the default.
+    :return: Manifest with one entry per file (BU, Key, Rows, Status, Error), or None on error.
+    """
 
     #Replace "+" with space to avoid errors.
     file_key = file_key.replace("+", " ") 
@@ -25,78 +68,56 @@ def Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key, column_name):
         file_name = os.path.basename(file_key).replace(".csv", "")
         #csv_file_path = FormatCSV(csv_file_path, "")
 
-         # Retrieve the object from S3
-        response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-        
-        # Read the file contents as a string. Adjust the decoding if needed (e.g., 'utf-8').
-        file_content = response['Body'].read().decode('utf-8')
-
-        # Use StringIO to simulate a file object for pandas
-        csv_buffer = StringIO(file_content)
-
-        # Read the CSV into a DataFrame, ensuring all columns are read as strings
-        df = pd.read_csv(csv_buffer, dtype=str)
-
-        # Check if the column exists
-        if column_name not in df.columns:
-            #logging.error(f"Column '{column_name}' does not exist in the CSV file.")
-            print(f"Column '{column_name}' does not exist in the CSV file.")
-            return
-        else:
-            print(f"Found column {column_name} in file.")
-
-        # --- Write DataFrame to Excel in memory ---
-        excel_buffer = io.BytesIO()
-        # The engine 'openpyxl' is used to write Excel files
-        df.to_excel(excel_buffer, index=False, engine='openpyxl')
-        excel_buffer.seek(0)  # Rewind the buffer so it can be read from the beginning
-        
+        # Read the CSV into a DataFrame, ensuring all columns are read as strings.
+        # Only read here when load_file did not share its frame.
+        if df is None:
+            df = read_csv_frame(bucket_name, file_key)
+
+        # Check if the columns exist
+        levels = parse_partition_spec(column_name)
+        for level in levels:
+            if level['Column'] not in df.columns:
+                #logging.error(f"Column '{level['Column']}' does not exist in the CSV file.")
+                print(f"Column '{level['Column']}' does not exist in the CSV file.")
+                return
+            else:
+                print(f"Found column {level['Column']} in file.")
+
         #Get tags from file and edit the Category tag
         split_file_tags = get_tags_from_file(bucket_name, file_key)
         split_file_tags['Parent File'] = os.path.basename(file_key)
         split_file_tags['BU'] = 'All'
         split_file_tags.pop('File Name') #Not needed here. 
 
-        # Define the S3 key for the output Excel file
-        output_key = f"DataValidation/{split_file_tags['Mock Number']}/{split_file_tags['Pillar']}/{split_file_tags['Data Entity']}/{split_file_tags['Source']}/1-Extracted/{file_name}.xlsx"
+        # Define the S3 key for the output file
+        output_format = normalize_output_format(output_format)
+        extension = get_output_extension(output_format)
+        output_folder = f"DataValidation/{split_file_tags['Mock Number']}/{split_file_tags['Pillar']}/{split_file_tags['Data Entity']}/{split_file_tags['Source']}/1-Extracted"
+        output_key = f"{output_folder}/{file_name}{extension}"
         print(f"Tag values before original file upload are: {split_file_tags}.") #For troublehooting.
-        
-        # --- Upload the Excel file to S3 and update tags ---
-        print("Before calling s3_upload from split csv.")
-        s3_upload(bucket_name, output_key, excel_buffer, split_file_tags)
-        
-        print(f"Main Excel file '{output_key}' created successfully in bucket '{bucket_name}'.")
 
-        # --- Process DataFrame: Split by Unique Value (first 5 characters) ---
-        unique_values = df[column_name].str[:5].unique()
-        
-        for value in unique_values:
-            # Filter the DataFrame for rows where the first 5 characters of column_name match 'value'
-            value_df = df[df[column_name].str[:5] == value]
-            
-            # Create an in-memory bytes buffer for the Excel file.
-            excel_buffer = io.BytesIO()
-            
-            # Write the subset DataFrame to the Excel buffer.
-            # The 'openpyxl' engine is used for writing Excel files.
-            value_df.to_excel(excel_buffer, index=False, engine='openpyxl')
-            excel_buffer.seek(0)  # Reset buffer pointer to the beginning.
-            
-            # Define the S3 key for the output Excel file.
-            # Example: "step1Validations/data_file_BU12345.xlsx"
-            output_key = f"DataValidation/{split_file_tags['Mock Number']}/{split_file_tags['Pillar']}/{split_file_tags['Data Entity']}/{split_file_tags['Source']}/1-Extracted/{file_name}_BU{value}.xlsx"
-            
-            # Upload the Excel file from memory to the specified S3 bucket.
-            s3_client.upload_fileobj(excel_buffer, Bucket=bucket_name, Key=output_key)
-            
-            # Specify BU Tag and add tags to uploaded file
-            split_file_tags['BU'] = value
-            print(f"Tags before uploading to S3: {split_file_tags}") #For troubleshooting.
-            add_tags_to_s3_object(bucket_name,output_key,split_file_tags)
-
-            # Log the upload status.
-            print(f"Excel file '{output_key}' created successfully for value '{value}' with tags {split_file_tags}.")
-    
+        # --- Process DataFrame: Split by the partition levels (by default the first 5 characters) ---
+        # Each level's key is computed once and a single groupby over all levels partitions every row,
+        # so the workers only serialize and upload. sort=False keeps the order of first appearance
+        # and dropna=False keeps rows without a key in their own partition.
+        partition_keys = compute_partition_keys(df, levels)
+
+        # --- Serialize, upload and tag the "All" file and every BU file through a bounded thread pool ---
+        with ThreadPoolExecutor(max_workers=SPLIT_UPLOAD_WORKERS) as executor:
+            futures = [executor.submit(upload_split_partition, s3_client, bucket_name, output_key, 'All', df, split_file_tags, output_format)]
+            for values, value_df in df.groupby(partition_keys, sort=False, dropna=False):
+                # Example: "DataValidation/.../1-Extracted/data_file_BU12345.xlsx"
+                value_output_key = build_partition_output_key(output_folder, file_name, levels, values, extension)
+                partition = {level['Label']: value for level, value in zip(levels[1:], values[1:])} or None
+                futures.append(executor.submit(upload_split_partition, s3_client, bucket_name, value_output_key, values[0], value_df, split_file_tags, output_format, partition))
+
+            manifest = [future.result() for future in futures]
+
+        failed = [entry for entry in manifest if entry["Status"] != "Success"]
+        print(f"Split of {file_key} finished: {len(manifest) - len(failed)} files uploaded, {len(failed)} failed.")
+        for entry in failed:
+            print(f"Split file '{entry['Key']}' for BU '{entry['BU']}' failed: {entry['Error']}")
+        return manifest
 
     except Exception as e:
         #logging.error(f"An error occurred: {e}")
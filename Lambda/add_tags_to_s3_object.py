@@ -1,5 +1,6 @@
 import boto3
 import json  # Import json to handle nested dictionaries
+from urllib.parse import urlencode, quote
 
 s3_client = boto3.client("s3")
 
@@ -26,6 +27,17 @@ def stringify_values(tags):
     
     return formatted_tags
 
+def build_tagging_header(tags):
+    """
+    Encodes tags for the Tagging parameter of put_object, create_multipart_upload and copy_object,
+    so an object is written with its tags in the same request.
+
+    :param tags: Dictionary of tags (any key-value pairs). Values go through stringify_values.
+    :return: URL-encoded "Key=Value&Key=Value" string.
+    """
+    tags = stringify_values(tags)
+    return urlencode(tags, quote_via=quote)
+
 def add_tags_to_s3_object(bucket_name, object_key, tags):
     """
     Dynamically adds tags to an S3 object.
@@ -0,0 +1,136 @@
+import time
+from parse_tsql_statement import parse_insert_statement
+
+# Bulk insert strategies.
+FAST_EXECUTEMANY = "fast_executemany"
+TABLE_VALUED_PARAMETER = "tvp"
+MULTI_ROW_VALUES = "multi_row_values"
+
+# SQL Server allows 2100 parameters per request and 1000 row constructors per VALUES clause.
+MAX_PARAMS_PER_STATEMENT = 2000
+MAX_ROWS_PER_VALUES = 1000
+
+# Loads up to this many rows go through multi-row VALUES statements.
+SMALL_LOAD_ROWS = 1000
+
+# Loads from this many rows go through a TVP when the TSQL file names a table type.
+TVP_MIN_ROWS = 10000
+
+# fast_executemany buffers a whole batch client side; size batches by cell count so wide tables use smaller batches.
+TARGET_CELLS_PER_BATCH = 500000
+MIN_BATCH_ROWS = 1000
+MAX_BATCH_ROWS = 50000
+
+
+def get_batch_size(column_count):
+    """Returns the number of rows per fast_executemany/TVP batch for a table with column_count columns."""
+    batch_size = TARGET_CELLS_PER_BATCH // max(column_count, 1)
+    return max(MIN_BATCH_ROWS, min(MAX_BATCH_ROWS, batch_size))
+
+
+def choose_bulk_insert_strategy(row_count, column_count, statement_info):
+    """
+    Picks the bulk insert strategy for a load.
+
+    :param row_count: Number of rows to insert.
+    :param column_count: Number of values per row.
+    :param statement_info: Result of parse_insert_statement (empty if the statement could not be parsed).
+    :return: One of FAST_EXECUTEMANY, TABLE_VALUED_PARAMETER or MULTI_ROW_VALUES.
+    """
+    if not statement_info:
+        # Only the statement as written can be run.
+        return FAST_EXECUTEMANY
+
+    if row_count <= SMALL_LOAD_ROWS and column_count <= MAX_PARAMS_PER_STATEMENT:
+        return MULTI_ROW_VALUES
+
+    if statement_info.get("tvp_type_name") and row_count >= TVP_MIN_ROWS:
+        return TABLE_VALUED_PARAMETER
+
+    return FAST_EXECUTEMANY
+
+
+def insert_fast_executemany(cursor, tsql_statement, rows, batch_size):
+    """Sends rows with pyodbc fast_executemany (parameter arrays) in batches of batch_size."""
+    try:
+        cursor.fast_executemany = True
+    except AttributeError:
+        # DB-API drivers other than pyodbc (e.g. sqlite3 when testing locally) fall back to plain executemany.
+        pass
+
+    for start in range(0, len(rows), batch_size):
+        cursor.executemany(tsql_statement, rows[start:start + batch_size])
+
+
+def insert_multi_row_values(cursor, statement_info, rows):
+    """Sends rows as INSERT ... VALUES (...), (...), ... statements with as many rows as the parameter limit allows."""
+    row_values = f"({statement_info['values_clause']})"
+    columns = ", ".join(statement_info["columns"])
+    params_per_row = max(statement_info["placeholder_count"], 1)
+    rows_per_statement = max(1, min(MAX_ROWS_PER_VALUES, MAX_PARAMS_PER_STATEMENT // params_per_row))
+
+    for start in range(0, len(rows), rows_per_statement):
+        chunk = rows[start:start + rows_per_statement]
+        values = ", ".join([row_values] * len(chunk))
+        statement = f"INSERT INTO {statement_info['table']} {statement_info['table_hint']} ({columns}) VALUES {values}"
+        cursor.execute(statement, [value for row in chunk for value in row])
+
+
+def insert_table_valued_parameter(cursor, statement_info, rows, batch_size):
+    """
+    Sends rows as a table-valued parameter of the table type named in the TSQL file.
+    The table type must have the same columns, in the same order, as the INSERT column list.
+    """
+    type_name = statement_info["tvp_type_name"]
+    schema_name, _, type_name = type_name.rpartition('.')
+    columns = ", ".join(statement_info["columns"])
+    statement = f"INSERT INTO {statement_info['table']} {statement_info['table_hint']} ({columns}) SELECT * FROM ?"
+
+    for start in range(0, len(rows), batch_size):
+        # pyodbc reads the table type name and schema from the first two elements of the TVP list.
+        tvp = [type_name, schema_name or "dbo"] + [tuple(row) for row in rows[start:start + batch_size]]
+        cursor.execute(statement, (tvp,))
+
+
+def bulk_insert(cnxn, tsql_statement, rows, strategy=None, statement_info=None):
+    """
+    Inserts rows with the TSQL load statement using the best bulk insert strategy for the load.
+    Does not commit; the caller owns the transaction.
+
+    :param cnxn: Open DB-API connection (pyodbc in Lambda).
+    :param tsql_statement: Single-row parameterized INSERT statement from the TSQL load file.
+    :param rows: List of rows (lists or tuples of values).
+    :param strategy: Force a strategy instead of choosing one from the row count and column width.
+    :param statement_info: parse_insert_statement result for tsql_statement when the caller already has it
+                           (see tsql_statement_cache); parsed here otherwise.
+    :return: Dictionary with 'strategy', 'rows', 'seconds' and 'rows_per_second'.
+    """
+    if statement_info is None:
+        statement_info = parse_insert_statement(tsql_statement)
+    column_count = len(rows[0]) if rows else 0
+    if strategy is None:
+        strategy = choose_bulk_insert_strategy(len(rows), column_count, statement_info)
+    batch_size = get_batch_size(column_count)
+    print(f"In bulk_insert using strategy {strategy} for {len(rows)} rows of {column_count} columns.") #For troubleshooting.
+
+    start_time = time.perf_counter()
+    cursor = cnxn.cursor()
+    try:
+        if strategy == MULTI_ROW_VALUES:
+            insert_multi_row_values(cursor, statement_info, rows)
+        elif strategy == TABLE_VALUED_PARAMETER:
+            insert_table_valued_parameter(cursor, statement_info, rows, batch_size)
+        else:
+            insert_fast_executemany(cursor, tsql_statement, rows, batch_size)
+    finally:
+        cursor.close()
+    seconds = time.perf_counter() - start_time
+
+    stats = {
+        "strategy": strategy,
+        "rows": len(rows),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(len(rows) / seconds) if seconds > 0 else len(rows)
+    }
+    print(f"In bulk_insert inserted {stats['rows']} rows in {stats['seconds']}s ({stats['rows_per_second']} rows/sec) with {strategy}.")
+    return stats
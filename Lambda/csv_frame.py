@@ -0,0 +1,28 @@
+import io
+import boto3
+import pandas as pd
+
+# pyarrow is optional; without it the Parquet split output format is not available.
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+s3_client = boto3.client("s3")
+
+
+def parse_csv_frame(file_content):
+    """Parses CSV bytes into a DataFrame with every column as str and missing values as NaN."""
+    return pd.read_csv(io.StringIO(file_content.decode('utf-8', errors="ignore")), dtype=str)
+
+
+def read_csv_frame(bucket_name, file_key, csv_response=None):
+    """
+    Returns the conversion CSV as a DataFrame (all columns str, missing values NaN).
+
+    :param csv_response: get_object response for the CSV when the caller already has one open.
+    """
+    if csv_response is None:
+        csv_response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
+    return parse_csv_frame(csv_response['Body'].read())
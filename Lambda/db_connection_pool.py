@@ -0,0 +1,167 @@
+import os
+import time
+import threading
+import pyodbc
+from contextlib import contextmanager
+from secrets_provider import DB_CONNECTION_SECRET, get_secret, invalidate_secret
+
+# Idle connections kept per connection string. Enough for a parallel load (partitions + owner connection).
+POOL_MAX_IDLE = int(os.environ.get("DB_POOL_MAX_IDLE", "5"))
+# Connections idle for longer than this are pinged before reuse; the Lambda container may have been frozen
+# and the server or the NAT may have dropped them. Reuse within the same invocation skips the ping.
+POOL_PING_AFTER_SECONDS = float(os.environ.get("DB_POOL_PING_AFTER_SECONDS", "5"))
+PING_QUERY = "SELECT 1"
+# SQLSTATE of a failed login, e.g. after the database password was rotated.
+LOGIN_FAILED_SQLSTATE = "28000"
+
+# Module level so connections survive across warm invocations: connection string -> [(connection, released_at)].
+connection_pools = {}
+pool_lock = threading.Lock()
+pool_stats = {"Hits": 0, "Misses": 0, "Pings": 0, "Discarded": 0}
+
+
+def count(stat):
+    with pool_lock:
+        pool_stats[stat] += 1
+
+
+def close_quietly(cnxn):
+    try:
+        cnxn.close()
+    except Exception:
+        pass
+
+
+def is_connection_alive(cnxn):
+    """Runs the cheap ping query; False if the connection is no longer usable."""
+    count("Pings")
+    try:
+        cursor = cnxn.cursor()
+        cursor.execute(PING_QUERY).fetchone()
+        cursor.close()
+        return True
+    except Exception as e:
+        print(f"Pooled connection failed its ping and is replaced: {e}")
+        return False
+
+
+def get_connection(connection_str):
+    """
+    Returns a connection from the pool for connection_str, or a new one when there is no usable idle connection.
+    Give it back with release_connection.
+    """
+    while True:
+        with pool_lock:
+            idle = connection_pools.get(connection_str)
+            cnxn, released_at = idle.pop() if idle else (None, None)
+        if cnxn is None:
+            break
+        if time.monotonic() - released_at <= POOL_PING_AFTER_SECONDS or is_connection_alive(cnxn):
+            count("Hits")
+            return cnxn
+        count("Discarded")
+        close_quietly(cnxn)
+
+    count("Misses")
+    return pyodbc.connect(connection_str)
+
+
+def release_connection(connection_str, cnxn, broken=False):
+    """
+    Returns a connection to the pool. Open transactions are rolled back first.
+    Connections that raised an error (broken=True) or do not fit in the pool are closed instead.
+    """
+    if not broken:
+        try:
+            cnxn.rollback()
+        except Exception:
+            broken = True
+
+    if not broken:
+        with pool_lock:
+            idle = connection_pools.setdefault(connection_str, [])
+            if len(idle) < POOL_MAX_IDLE:
+                idle.append((cnxn, time.monotonic()))
+                return
+
+    if broken:
+        count("Discarded")
+    close_quietly(cnxn)
+
+
+def discard_pool(connection_str):
+    """Closes the idle connections of a connection string that is no longer valid."""
+    with pool_lock:
+        idle = connection_pools.pop(connection_str, [])
+    for cnxn, _ in idle:
+        close_quietly(cnxn)
+
+
+def is_login_failure(error):
+    """True if a pyodbc error is a failed login."""
+    return isinstance(error, pyodbc.Error) and bool(error.args) and error.args[0] == LOGIN_FAILED_SQLSTATE
+
+
+def handle_login_failure(error, secret_name=DB_CONNECTION_SECRET):
+    """
+    Forgets the cached connection string when error is a failed login, so the next connection reads
+    the rotated secret. Returns True if it was a login failure.
+    """
+    if not is_login_failure(error):
+        return False
+    print(f"Login failed; the secret {secret_name} is read again on the next connection.")
+    old_connection_str = invalidate_secret(secret_name)
+    if old_connection_str:
+        discard_pool(old_connection_str)
+    return True
+
+
+def get_database_connection(secret_name=DB_CONNECTION_SECRET):
+    """
+    Returns (connection_str, connection) for the database whose connection string is stored in secret_name.
+    On a failed login the secret is read again once and the connection retried.
+    """
+    connection_str = get_secret(secret_name)
+    try:
+        return connection_str, get_connection(connection_str)
+    except pyodbc.Error as e:
+        if not handle_login_failure(e, secret_name):
+            raise
+    connection_str = get_secret(secret_name)
+    return connection_str, get_connection(connection_str)
+
+
+@contextmanager
+def pooled_connection(connection_str):
+    """
+    Context manager for a pooled connection. Commit inside the block; anything not committed is rolled back
+    when the connection goes back to the pool. A connection that raised an error is replaced.
+
+    Usage:
+        with pooled_connection(connection_str) as cnxn:
+            ...
+    """
+    cnxn = get_connection(connection_str)
+    yield from _use_connection(connection_str, cnxn)
+
+
+@contextmanager
+def database_connection(secret_name=DB_CONNECTION_SECRET):
+    """Like pooled_connection, for the connection string stored in secret_name (see get_database_connection)."""
+    connection_str, cnxn = get_database_connection(secret_name)
+    yield from _use_connection(connection_str, cnxn)
+
+
+def _use_connection(connection_str, cnxn):
+    try:
+        yield cnxn
+    except BaseException:
+        release_connection(connection_str, cnxn, broken=True)
+        raise
+    release_connection(connection_str, cnxn)
+
+
+def get_pool_stats():
+    """Returns the pool hit/miss/ping/discard counters and the number of idle connections."""
+    with pool_lock:
+        return dict(pool_stats, Idle=sum(len(idle) for idle in connection_pools.values()))
@@ -1,40 +1,121 @@
-import boto3
-import pyodbc
+import os
 import pandas as pd
-from get_aws_secret import get_aws_secret
 from generate_validation_file import *
 from get_tags_from_file import get_tags_from_file
+from object_session import get_object_head
 from relocate_file import relocate_file_specified_new_key
+from bulk_insert import bulk_insert
+from parallel_load import parallel_insert_rows, PARALLEL_PARTITIONS
+from staging_table import staged_insert_rows
+from parse_tsql_statement import count_placeholders, parse_insert_statement
+from db_connection_pool import database_connection, handle_login_failure, get_pool_stats
+from secrets_provider import get_database_connection_string
 
-connection_str = get_aws_secret("Hacienda_ERP_Test_MSSQL_text")
+# pyarrow is optional; without it the 'arrow' return format returns the same columns as 'columnar'.
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
 
-def execute_tsql(tsql_query, return_format='dict'):
+# The connection string is read from Secrets Manager on first use (see secrets_provider), not at import time.
+
+# Load modes for insert_rows.
+LOAD_MODE_DIRECT = "direct"      # One connection, rows inserted straight into the target table.
+LOAD_MODE_PARALLEL = "parallel"  # Partitions inserted concurrently into a staging table, then switched in.
+LOAD_MODE_STAGING = "staging"    # Rows bulk inserted into a session temp heap, then switched in with TABLOCK.
+DEFAULT_LOAD_MODE = os.environ.get("LOAD_MODE", LOAD_MODE_DIRECT)
+
+# Rows read per fetchmany call by the 'iterator', 'columnar', 'arrow' and 'dataframe' return formats.
+FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", "5000"))
+
+def fetch_batches(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Yields the rows of the current result set in fetchmany batches."""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        yield batch
+
+def fetch_column_values(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Reads the current result set into (column names, one list of values per column), without a dict per row."""
+    columns = [column[0] for column in cursor.description]
+    values = [[] for _ in columns]
+    for batch in fetch_batches(cursor, batch_size):
+        for column_values, batch_values in zip(values, zip(*batch)):
+            column_values.extend(batch_values)
+    return columns, values
+
+def fetch_columns(cursor, batch_size=FETCH_BATCH_SIZE):
+    """Reads the current result set into a dictionary of column name -> list of values, without a dict per row."""
+    columns, values = fetch_column_values(cursor, batch_size)
+    return dict(zip(columns, values))
+
+def stream_rows(tsql_query, params=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Generator behind the 'iterator' return format. The first value it yields is the column names, once the
+    query has run; then every row. The pooled connection is held until the rows are exhausted or the
+    generator is closed.
+    """
+    with database_connection() as conn:
+        with conn.cursor() as cursor:
+            if params:
+                cursor.execute(tsql_query, params)
+            else:
+                cursor.execute(tsql_query)
+            try:
+                yield [column[0] for column in cursor.description]
+                for batch in fetch_batches(cursor, batch_size):
+                    yield from batch
+            except GeneratorExit:
+                # Abandoned early: the cursor is closed and the connection goes back to the pool as usual.
+                pass
+
+def execute_tsql(tsql_query, return_format='dict', params=None):
     """
     Executes a T-SQL query and returns results in the specified format.
 
     Parameters:
         tsql_query (str): The T-SQL query to execute.
-        connection_string (str): The connection string for the database.
+        params (tuple): Values for the ? parameters in the query (see query_templates).
         return_format (str): The format of the returned data.
                              Options:
                                - 'dict'         : List of dictionaries (default)
                                - 'tuple'        : List of tuples
                                - 'dataframe'    : Pandas DataFrame
                                - 'first_column' : List containing only the first column value of each row
+                               - 'iterator'     : Iterator of rows (tuple-like pyodbc Rows), read in fetchmany batches.
+                                                  The connection stays in use until it is exhausted or closed.
+                               - 'columnar'     : Dictionary of column name -> list of values
+                               - 'arrow'        : pyarrow Table (the 'columnar' dictionary when pyarrow is not available)
+                               - 'result_sets'  : List with a list of dictionaries per result set, for batches of several SELECTs
 
     Returns:
         The query results in the specified format, or None if an error occurs.
+        Errors raised while reading an 'iterator' after it is returned are not caught.
     """
     try:
-        with pyodbc.connect(connection_str) as conn:
+        # Streams: the query runs now, so errors in it return None like the other formats.
+        if return_format == 'iterator':
+            rows = stream_rows(tsql_query, params)
+            next(rows)  # Column names.
+            return rows
+
+        # Connections are pooled and reused across warm invocations.
+        with database_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(tsql_query)
+                if params:
+                    cursor.execute(tsql_query, params)
+                else:
+                    cursor.execute(tsql_query)
                 
                 # Option 1: Return as a Pandas DataFrame
                 if return_format == 'dataframe':
-                    rows = cursor.fetchall()
-                    columns = [column[0] for column in cursor.description]
-                    return pd.DataFrame(rows, columns=columns)
+                    columns, values = fetch_column_values(cursor)
+                    # Positional keys, so columns with the same name (common in joins) are all kept.
+                    frame = pd.DataFrame(dict(enumerate(values)))
+                    frame.columns = columns
+                    return frame
                 
                 # Option 2: Return as a list of tuples
                 elif return_format == 'tuple':
@@ -44,6 +125,28 @@ def execute_tsql(tsql_query, return_format='dict'):
                 elif return_format == 'first_column':
                     return [row[0] for row in cursor.fetchall()]
                 
+                # Option 4: Return as columns, without a dictionary per row
+                elif return_format == 'columnar':
+                    return fetch_columns(cursor)
+
+                # Option 5: Return as an Arrow table built from the columns
+                elif return_format == 'arrow':
+                    columns = fetch_columns(cursor)
+                    if not ARROW_AVAILABLE:
+                        print("pyarrow is not available; returning the columns as lists.")
+                        return columns
+                    return pa.Table.from_pydict(columns)
+
+                # Option 6: Return every result set of a batch, read with nextset()
+                elif return_format == 'result_sets':
+                    result_sets = []
+                    while True:
+                        if cursor.description:
+                            columns = [column[0] for column in cursor.description]
+                            result_sets.append([dict(zip(columns, row)) for row in cursor.fetchall()])
+                        if not cursor.nextset():
+                            return result_sets
+
                 # Default Option: Return as a list of dictionaries
                 else:
                     columns = [column[0] for column in cursor.description]
@@ -53,117 +156,152 @@ def execute_tsql(tsql_query, return_format='dict'):
         print(f"Error executing query: {e}")
         return None
 
-def insert_rows(tsql_statement, rows, csv_bucket_name, csv_file_key):
+def write_insert_rows_error(csv_bucket_name, csv_file_key, e):
+    """Writes the insert rows error file for a failed load and moves the parent file to ConversionFileErrors."""
+    #Get parent file name and other data needed.
+    parent_file_name = csv_file_key.split('/')[-1]
+    parent_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
+    print(f"parent_file_tags are: {parent_file_tags}") #For troubleshooting.
+    tags_for_insert_rows_error = parent_file_tags.copy()
+    print(f"tags_for_insert_rows_error are: {tags_for_insert_rows_error}") #For troubleshooting.
+    #Get the parent file folders to be used in error file key
+    parts = csv_file_key.strip('/').split('/')
+    folders_for_error_file_key = '/'.join(parts[1:-1])
+    print(f"In insert rows error the folders_for_error_file_key is: {folders_for_error_file_key}")
+
+    #Update "Errors and Warnings" tag in parent file
+    if parent_file_tags.get('Errors and Warnings'):
+        parent_file_tags["Errors and Warnings"] = f"{parent_file_tags.get('Errors and Warnings')} - Insert Rows: Fail"
+        #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+    else:
+        parent_file_tags["Errors and Warnings"] = "Insert Rows: Fail"
+        #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+    
+    #Update tags that will be uploaded to validation error file.
+    tags_for_insert_rows_error["File Category"] = "Insert Rows Failed"
+    tags_for_insert_rows_error["Parent File Name"] = parent_file_name
+
+    # Get the parent file last modified date and time and apply formatting.
+    response = get_object_head(csv_bucket_name, csv_file_key)
+    last_modified = response["LastModified"]  
+    last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
+
+    #Generate validation file name.
+    message = f"Could not load {parent_file_name} because of the following error: {e}"
+    error_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name} (Insert Rows Error).txt"
+    generate_insert_rows_error_file(tags_for_insert_rows_error, error_file_key, message)
+
+    #Relocate the parent file.
+    new_parent_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name}"
+    relocate_file_specified_new_key(csv_bucket_name, csv_file_key, new_parent_file_key, parent_file_tags)
+
+def write_param_count_error(csv_bucket_name, csv_file_key, expected_params, provided_params):
+    """Writes the parameter count error file and moves the parent file to ConversionFileErrors."""
+    #Get parent file name and other data needed.
+    parent_file_name = csv_file_key.split('/')[-1]
+    parent_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
+    print(f"parent_file_tags are: {parent_file_tags}") #For troubleshooting.
+    tags_for_invalid_number_of_params = parent_file_tags.copy()
+    print(f"tags_for_invalid_number_of_params are: {tags_for_invalid_number_of_params}") #For troubleshooting.
+    #Get the parent file folders to be used in error file key
+    parts = csv_file_key.strip('/').split('/')
+    folders_for_error_file_key = '/'.join(parts[1:-1])
+    print(f"In insert rows number of params error the folders_for_error_file_key is: {folders_for_error_file_key}")
+
+    #Update "Errors and Warnings" tag in parent file
+    if parent_file_tags.get('Errors and Warnings'):
+        parent_file_tags["Errors and Warnings"] = f"{parent_file_tags.get('Errors and Warnings')} - File Load Param Count: Fail"
+        #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+    else:
+        parent_file_tags["Errors and Warnings"] = "File Load Param Count: Fail"
+        #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+    
+    #Update tags that will be uploaded to validation error file.
+    tags_for_invalid_number_of_params["File Category"] = "Invalid Number of Params"
+    tags_for_invalid_number_of_params["Parent File Name"] = parent_file_name
+
+    # Get the parent file last modified date and time and apply formatting.
+    response = get_object_head(csv_bucket_name, csv_file_key)
+    last_modified = response["LastModified"]  
+    last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
+
+    #Generate validation file name.
+    message = f"Load file {parent_file_name} has a total of {provided_params} parameters. Nonetheless; the TSQL file expects {expected_params} parameters."
+    error_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name} (Load Params Count Error).txt"
+    generate_load_file_param_count_error_file(tags_for_invalid_number_of_params, error_file_key, message)
+
+    #Relocate the parent file.
+    new_parent_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name}"
+    relocate_file_specified_new_key(csv_bucket_name, csv_file_key, new_parent_file_key, parent_file_tags)
+
+def insert_rows(tsql_statement, rows, csv_bucket_name, csv_file_key, load_mode=None, partitions=PARALLEL_PARTITIONS, tsql_entry=None):
+    """
+    Inserts the CSV rows with the TSQL load statement and writes an error file if the load fails.
+
+    Parameters:
+        load_mode (str): LOAD_MODE_DIRECT, LOAD_MODE_PARALLEL or LOAD_MODE_STAGING. Defaults to the LOAD_MODE environment variable.
+        partitions (int): Number of concurrent partitions for LOAD_MODE_PARALLEL.
+        tsql_entry (dict): Cached analysis of the statement (see tsql_statement_cache). Derived from tsql_statement when not given.
+
+    Returns:
+        True if the rows were inserted, None otherwise.
+    """
     print("In insert_rows.") #for troubleshooting
+    load_mode = load_mode or DEFAULT_LOAD_MODE
 
     tsql_statement = tsql_statement.strip()  # Remove extra whitespace/newlines
     print("T-SQL Statement:", tsql_statement)
-    expected_params = tsql_statement.count('?')
+    if tsql_entry is None:
+        statement_info = parse_insert_statement(tsql_statement)
+        expected_params = count_placeholders(tsql_statement)
+    else:
+        statement_info = tsql_entry["Statement Info"]
+        expected_params = tsql_entry["Expected Params"]
     provided_params = len(rows[0])
     
     if rows and expected_params == provided_params:
         print(f"Expected parameters: {expected_params}, Provided parameters: {provided_params}")
+        if load_mode in (LOAD_MODE_PARALLEL, LOAD_MODE_STAGING) and not statement_info:
+            # Parallel and staged loads retarget the statement at a staging table, which needs the parsed table and columns.
+            print(f"The TSQL load statement is not a single INSERT ... VALUES statement; using load mode {LOAD_MODE_DIRECT} instead of {load_mode}.")
+            load_mode = LOAD_MODE_DIRECT
         try:
-            cnxn = pyodbc.connect(connection_str)
-            cursor = cnxn.cursor()
-            cursor.executemany(tsql_statement, rows)
-            cnxn.commit()
-            cursor.close()
-            cnxn.close()
-            print("T-SQL executed successfully.")
+            if load_mode == LOAD_MODE_PARALLEL:
+                parallel_insert_rows(get_database_connection_string(), tsql_statement, rows, partitions, statement_info)
+                print(f"T-SQL executed successfully in {partitions} parallel partitions.")
+                return True
+
+            if load_mode == LOAD_MODE_STAGING:
+                staged_insert_rows(get_database_connection_string(), tsql_statement, rows, statement_info)
+                print("T-SQL executed successfully through a staging table.")
+                return True
+
+            with database_connection() as cnxn:
+                insert_stats = bulk_insert(cnxn, tsql_statement, rows, statement_info=statement_info)
+                cnxn.commit()
+            print(f"T-SQL executed successfully. {insert_stats['rows_per_second']} rows/sec using {insert_stats['strategy']}.")
+            print(f"Connection pool stats: {get_pool_stats()}") #For troubleshooting.
+            return True
         except Exception as e:
             print(f"Error executing T-SQL: {e}")
-        
-            #Get parent file name and other data needed.
-            parent_file_name = csv_file_key.split('/')[-1]
-            parent_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
-            print(f"parent_file_tags are: {parent_file_tags}") #For troubleshooting.
-            tags_for_insert_rows_error = parent_file_tags.copy()
-            print(f"tags_for_insert_rows_error are: {tags_for_insert_rows_error}") #For troubleshooting.
-            #Get the parent file folders to be used in error file key
-            parts = csv_file_key.strip('/').split('/')
-            folders_for_error_file_key = '/'.join(parts[1:-1])
-            print(f"In insert rows error the folders_for_error_file_key is: {folders_for_error_file_key}")
-
-            #Update "Errors and Warnings" tag in parent file
-            if parent_file_tags.get('Errors and Warnings'):
-                parent_file_tags["Errors and Warnings"] = f"{parent_file_tags.get('Errors and Warnings')} - Insert Rows: Fail"
-                #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
-            else:
-                parent_file_tags["Errors and Warnings"] = "Insert Rows: Fail"
-                #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
-            
-            #Update tags that will be uploaded to validation error file.
-            tags_for_insert_rows_error["File Category"] = "Insert Rows Failed"
-            tags_for_insert_rows_error["Parent File Name"] = parent_file_name
-
-            # Get the parent file last modified date and time and apply formatting.
-            s3_client = boto3.client('s3')
-            response = s3_client.head_object(Bucket=csv_bucket_name, Key=csv_file_key)
-            last_modified = response["LastModified"]  
-            last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
-
-            #Generate validation file name.
-            message = f"Could not load {parent_file_name} because of the following error: {e}"
-            error_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name} (Insert Rows Error).txt"
-            generate_insert_rows_error_file(tags_for_insert_rows_error, error_file_key, message)
-
-            #Relocate the parent file.
-            new_parent_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name}"
-            relocate_file_specified_new_key(csv_bucket_name, csv_file_key, new_parent_file_key, parent_file_tags)
-            
+            handle_login_failure(e)
+            write_insert_rows_error(csv_bucket_name, csv_file_key, e)
             return None
     
     else:
         print(f"Provided param count not equal to expected param count. Expected parameters: {expected_params}, Provided parameters: {provided_params}")
-        
-
-        #Get parent file name and other data needed.
-        parent_file_name = csv_file_key.split('/')[-1]
-        parent_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
-        print(f"parent_file_tags are: {parent_file_tags}") #For troubleshooting.
-        tags_for_invalid_number_of_params = parent_file_tags.copy()
-        print(f"tags_for_invalid_number_of_params are: {tags_for_invalid_number_of_params}") #For troubleshooting.
-        #Get the parent file folders to be used in error file key
-        parts = csv_file_key.strip('/').split('/')
-        folders_for_error_file_key = '/'.join(parts[1:-1])
-        print(f"In insert rows number of params error the folders_for_error_file_key is: {folders_for_error_file_key}")
-
-        #Update "Errors and Warnings" tag in parent file
-        if parent_file_tags.get('Errors and Warnings'):
-            parent_file_tags["Errors and Warnings"] = f"{parent_file_tags.get('Errors and Warnings')} - File Load Param Count: Fail"
-            #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
-        else:
-            parent_file_tags["Errors and Warnings"] = "File Load Param Count: Fail"
-            #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
-        
-        #Update tags that will be uploaded to validation error file.
-        tags_for_invalid_number_of_params["File Category"] = "Invalid Number of Params"
-        tags_for_invalid_number_of_params["Parent File Name"] = parent_file_name
-
-        # Get the parent file last modified date and time and apply formatting.
-        s3_client = boto3.client('s3')
-        response = s3_client.head_object(Bucket=csv_bucket_name, Key=csv_file_key)
-        last_modified = response["LastModified"]  
-        last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
-
-        #Generate validation file name.
-        message = f"Load file {parent_file_name} has a total of {provided_params} parameters. Nonetheless; the TSQL file expects {expected_params} parameters."
-        error_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name} (Load Params Count Error).txt"
-        generate_load_file_param_count_error_file(tags_for_invalid_number_of_params, error_file_key, message)
-
-        #Relocate the parent file.
-        new_parent_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name}"
-        relocate_file_specified_new_key(csv_bucket_name, csv_file_key, new_parent_file_key, parent_file_tags)
-        
+        write_param_count_error(csv_bucket_name, csv_file_key, expected_params, provided_params)
         return None
 
-def update_stmnt(tsql_query):
+def update_stmnt(tsql_query, params=None):
 
     try:
-        with pyodbc.connect(connection_str) as conn:
+        with database_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(tsql_query)
+                if params:
+                    cursor.execute(tsql_query, params)
+                else:
+                    cursor.execute(tsql_query)
                 conn.commit()
                 return cursor.rowcount
     except Exception as e:
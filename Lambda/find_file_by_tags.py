@@ -1,40 +1,74 @@
-import boto3
+from botocore.exceptions import ClientError
+from scan_s3_prefix import scan_s3_prefix
+from tsql_statement_cache import get_tsql_statement
+from tsql_index import (find_tsql_index_entry, update_tsql_index, remove_tsql_index_key, rebuild_tsql_index,
+                        is_tsql_load_file, TSQL_INDEX_TAGS)
 
-def find_tsql_load_file_by_tags(bucket_name, tags_to_match):
+def scan_tsql_load_files(bucket_name):
+    """
+    Lists every file in the TSQLFiles folder with its tags.
+
+    :param bucket_name: Name of the S3 bucket.
+    :return: Generator of (file_key, tags, last_modified) tuples.
+    """
+    # Every page of the folder is listed and the tags are fetched concurrently.
+    for file_key, size, etag, last_modified, tags in scan_s3_prefix(bucket_name, 'TSQLFiles/'):
+        yield file_key, tags, last_modified
+
+def find_tsql_load_file_by_tags(bucket_name, tags_to_match, use_index=True):
     """
     Searches for a file in an S3 bucket that matches specific tag values and is located in the TSQLFiles folder.
-    
+    Only files with the Load category match; Validation and Recon files of the same entity are skipped.
+
+    The TSQL index (see tsql_index) answers the lookup with a single read. Files missing from the index
+    are found by scanning the folder, and the index is repaired with the result.
+
     :param bucket_name: Name of the S3 bucket.
     :param tags_to_match: Dictionary with tag keys and values to match.
+    :param use_index: False to skip the index and scan the folder (e.g. when the indexed file no longer exists).
     :return: Tuple (bucket_name, file_key) if found, otherwise None.
     """
-    s3_client = boto3.client('s3')
-
-    # List objects in the bucket
-    response = s3_client.list_objects_v2(Bucket=bucket_name,Prefix='TSQLFiles/')
-    if 'Contents' not in response:
-        print(f"No files in bucket {bucket_name}") #For troubleshooting.
-        return None  # No files found
-
-    for obj in response['Contents']:
-        file_key = obj['Key']
-        #print(f"In find_tsql_load_file_by_tags the key of file to compare is {file_key}") #For troubleshooting.
-        
-        # Check if the file is in the TSQLFiles folder
-        if not file_key.startswith("TSQLFiles/"):
-            #print(f"Skipped the file because not TSQLFiles folder,") #For troubleshooting.
-            continue
-
-        # Get tags for the object
-        tagging_response = s3_client.get_object_tagging(Bucket=bucket_name, Key=file_key)
-        tags = {tag['Key']: tag['Value'] for tag in tagging_response['TagSet']}
-        #print(f"Tags are: {tags}") #For troubleshooting.
-        
-        # Only check for specific required tags
-        required_tags = {"Pillar", "Data Entity", "Mock Number", "Source"}
-        if all(tags.get(tag) == value for tag, value in tags_to_match.items() if tag in required_tags):
+    if use_index:
+        file_key = find_tsql_index_entry(bucket_name, tags_to_match)
+        if file_key:
+            print(f"In find_tsql_load_file_by_tags found {file_key} in the TSQL index.") #For troubleshooting.
+            return bucket_name, file_key
+
+    print(f"In find_tsql_load_file_by_tags no TSQL index entry for {tags_to_match}; scanning TSQLFiles.") #For troubleshooting.
+    # Only check for specific required tags
+    required_tags = set(TSQL_INDEX_TAGS)
+    for file_key, tags, last_modified in scan_tsql_load_files(bucket_name):
+        if is_tsql_load_file(tags) and all(tags.get(tag) == value for tag, value in tags_to_match.items() if tag in required_tags):
             #print(f"Found TSQL File {file_key}") #For troubleshooting.
+            update_tsql_index(bucket_name, file_key, tags)
             return bucket_name, file_key
     print(f"No files found with the following tags: {tags_to_match}") #For troubleshooting.
     return None  # No matching file found
 
+def get_tsql_load_statement_by_tags(bucket_name, tags_to_match):
+    """
+    Finds the TSQL load file for the tags and returns its statement (see get_tsql_statement).
+    An index entry pointing to a file that no longer exists is dropped and the folder is scanned instead.
+
+    :return: Tuple (file_key, statement entry) if found, otherwise None.
+    """
+    result = find_tsql_load_file_by_tags(bucket_name, tags_to_match)
+    if not result:
+        return None
+    file_key = result[1]
+    try:
+        return file_key, get_tsql_statement(bucket_name, file_key)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ("NoSuchKey", "404"):
+            raise
+
+    print(f"In get_tsql_load_statement_by_tags the indexed file {file_key} no longer exists; scanning TSQLFiles.") #For troubleshooting.
+    remove_tsql_index_key(bucket_name, file_key)
+    result = find_tsql_load_file_by_tags(bucket_name, tags_to_match, use_index=False)
+    if not result:
+        return None
+    return result[1], get_tsql_statement(bucket_name, result[1])
+
+def rebuild_tsql_index_from_files(bucket_name):
+    """Rebuilds the TSQL index from the tags of every file in TSQLFiles (recovery command)."""
+    return rebuild_tsql_index(bucket_name, scan_tsql_load_files(bucket_name))
@@ -3,8 +3,8 @@ import boto3
 import os
 import pandas as pd
 from io import BytesIO
-from s3_upload import s3_upload
-from openpyxl import Workbook
+from s3_upload import s3_upload, s3_upload_stream
+from xlsx_writer import write_rows_to_xlsx, write_frame_to_xlsx
 
 def generate_file_name_validation_file(tags, output_file_key):
     print(f"In generate_file_name_validation_file tags are: {tags}")  # For troubleshooting.
@@ -20,25 +20,12 @@ def generate_file_name_validation_file(tags, output_file_key):
     message = f"Initial Upload File not expected for file {parent_file_name} based on tag values:"
     tag_data = [(key, tags.get(key, "N/A")) for key in required_keys]
     
-    # Create an Excel file in memory using openpyxl
-    output = BytesIO()
-    workbook = Workbook()
-    sheet = workbook.active
-    sheet.title = "Tags"
-    
-    # Write message at the beginning
-    sheet.append([message])
-    sheet.append([])  # Blank row for separation
-    
-    # Write headers
-    sheet.append(["Tag Key", "Tag Value"])
-    
-    # Write tag data
-    for key, value in tag_data:
-        sheet.append([key, value])
+    # Message at the beginning, a blank row for separation, then headers and tag data
+    rows = [[message], [], ["Tag Key", "Tag Value"]] + [[key, value] for key, value in tag_data]
     
-    # Save the workbook to the BytesIO buffer
-    workbook.save(output)
+    # Create an Excel file in memory
+    output = BytesIO()
+    write_rows_to_xlsx(output, rows, sheet_title="Tags")
     output.seek(0)
     
     # Upload the file to S3
@@ -55,17 +42,22 @@ def generate_header_validation_file(tags, output_file_key, comparison_results):
     bucket_name = "hacienda-erp"
     
     """Generate a header validation Excel file and upload it to S3."""
-    output_file = "/tmp/header_validation.xlsx"
-    
     df = pd.DataFrame(comparison_results, columns=["Order Number", "CSV Header", "Database Header", "Exact Match"])
-    df.to_excel(output_file, index=False)
-    
-    with open(output_file, "rb") as file:
-        file_content = file.read()
-    
-    s3_upload(bucket_name, output_file_key, file_content, tags)
+    s3_upload_stream(bucket_name, output_file_key, lambda output: write_frame_to_xlsx(df, output), tags)
     print(f"Header validation file uploaded to s3://{bucket_name}/{output_file_key}")
 
+def generate_encoding_validation_file(tags, output_file_key, encoding_report):
+    print(f"In generate_encoding_validation_file tags are: {tags}")  # For troubleshooting.
+    bucket_name = "hacienda-erp"
+    
+    """Generate an encoding validation Excel file listing every invalid byte or character and upload it to S3."""
+    df = pd.DataFrame(encoding_report["Issues"], columns=["Line", "Column", "Byte Offset", "Value", "Issue"])
+    if encoding_report["Issue Count"] > len(df):
+        # Only the first issues are listed; say how many were found in total.
+        df.loc[len(df)] = ["", "", "", "", f"{encoding_report['Issue Count'] - len(df)} more issues not listed."]
+    s3_upload_stream(bucket_name, output_file_key, lambda output: write_frame_to_xlsx(df, output), tags)
+    print(f"Encoding validation file uploaded to s3://{bucket_name}/{output_file_key}")
+
 def generate_file_expected_validation_file(tags, output_file_key):
     print(f"In generate_file_expected_validation_file tags are: {tags}")  # For troubleshooting.
     
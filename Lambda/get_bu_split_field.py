@@ -1,4 +1,4 @@
-from execute_tsql import execute_tsql
+from setup_metadata_cache import find_plan_row_by_table_name, get_row_value
 from get_tags_from_file import get_tags_from_file
 
 def get_bu_split_field(bucket_name, file_key):
@@ -19,17 +19,13 @@ def get_bu_split_field(bucket_name, file_key):
     #table_name = f"SETUP_FILE_COLUMN_NAMES_{mock_number}"
     table_name = f"SETUP_CONVERSION_PLAN_{mock_number}"
 
-    #Build TSQL statement
-    tsql_query = (
-                    #f"SELECT TOP 1 1 FROM {table_name} WHERE file_name = '{expected_value}';"
-                    f"SELECT TOP 1 extractefieldbu FROM {table_name} WHERE table_name = '{table_name_tag}';"
-                )
-    
-    print(f"In get_bu_split_field the query to be ran is: {tsql_query}") #For troubleshooting
+    #The extractefieldbu column of the table's first plan row, from the cached snapshot of the setup table (see setup_metadata_cache).
+    print(f"In get_bu_split_field looking up {table_name_tag} in {table_name}") #For troubleshooting
 
-    result  = execute_tsql(tsql_query)
+    result = find_plan_row_by_table_name(mock_number, table_name_tag)
 
-    bu_split_field = result[0]['extractefieldbu']
+    # A column name, or a partition spec such as "BUSINESS_UNIT, ACCOUNTING_DT:month" (see partition_spec).
+    bu_split_field = get_row_value(result, "extractefieldbu") if result else None
 
     print(f"In In get_bu_split_field the bu_split_field to be retfurned is {bu_split_field}")
 
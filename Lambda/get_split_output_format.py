@@ -0,0 +1,37 @@
+from setup_metadata_cache import find_plan_row_by_table_name, get_row_value
+from get_tags_from_file import get_tags_from_file
+from split_output_formats import normalize_output_format
+
+# Optional column of SETUP_CONVERSION_PLAN_<mock> holding the split output format (xlsx, csv.gz or parquet).
+SPLIT_OUTPUT_FORMAT_COLUMN = "splitoutputformat"
+
+def get_split_output_format(bucket_name, file_key):
+    """
+    Returns the split output format configured for the file's table in SETUP_CONVERSION_PLAN_<mock>.
+    Tables without a value (or plans without the column) use DEFAULT_SPLIT_OUTPUT_FORMAT.
+    """
+    #Replace "+" with space to avoid errors.
+    file_key = file_key.replace("+", " ")
+
+    #Get file tag values
+    tags = get_tags_from_file(bucket_name, file_key)
+
+    # Extract Table Name and Mock Number from tags
+    mock_number = tags.get('Mock Number')
+    table_name_tag = tags.get('Table Name')
+
+    # Construct table name
+    table_name = f"SETUP_CONVERSION_PLAN_{mock_number}"
+
+    #Plan row from the cached snapshot of the setup table (see setup_metadata_cache).
+    #Plans that do not have the column yet use the default.
+    print(f"In get_split_output_format looking up {table_name_tag} in {table_name}") #For troubleshooting
+
+    result = find_plan_row_by_table_name(mock_number, table_name_tag)
+
+    configured_format = get_row_value(result, SPLIT_OUTPUT_FORMAT_COLUMN) if result else None
+
+    split_output_format = normalize_output_format(configured_format)
+    print(f"In get_split_output_format the split output format for {table_name_tag} is {split_output_format}") #For troubleshooting
+
+    return split_output_format
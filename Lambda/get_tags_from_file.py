@@ -1,4 +1,5 @@
 import boto3
+from object_session import get_object_tags
 
 s3_client = boto3.client("s3")
 
@@ -8,8 +9,8 @@ def get_tags_from_file(bucket_name, file_key):
     try:
         # Try to fetch tags first
         print(f"Get tags from {bucket_name} and File {file_key}") #for trubleshooting
-        tagging_response = s3_client.get_object_tagging(Bucket=bucket_name, Key=file_key)
-        tags = {tag['Key']: tag['Value'] for tag in tagging_response.get('TagSet', [])}
+        # Read once per invocation; later calls and buffered tag writes are answered by the object session.
+        tags = get_object_tags(bucket_name, file_key)
         print(f"Tags: {tags}") #For troubleshooting.
 
         return tags
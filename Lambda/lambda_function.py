@@ -7,13 +7,20 @@ from add_tags_to_s3_object import add_tags_to_s3_object
 from Split_CSV_File_By_BU_FiveCharacters import Split_CSV_File_By_BU_FiveCharacters
 from get_aws_secret import get_aws_secret
 from execute_tsql import execute_tsql, update_stmnt
+from query_templates import run_update
 from load_file import load_file
 from relocate_file import relocate_file
 from validate_tag_values import validate_tag_values
 from get_bu_split_field import get_bu_split_field
-from generate_validation_file import generate_file_name_validation_file, generate_file_expected_validation_file
+from get_split_output_format import get_split_output_format
+from generate_validation_file import generate_file_name_validation_file, generate_file_expected_validation_file, generate_encoding_validation_file
+from validate_encoding import validate_file_encoding
 from datetime import datetime
 from get_tags_from_file import get_tags_from_file
+from object_session import start_object_session, set_object_tags, flush_object_tags
+from tsql_index import update_tsql_index, REBUILD_TSQL_INDEX_COMMAND
+from find_file_by_tags import rebuild_tsql_index_from_files
+from setup_metadata_cache import invalidate_setup_metadata
 
 def get_current_user(access_token):
     """
@@ -46,6 +53,11 @@ def lambda_handler(event, context):
     # Log the entire event to see its structure
     print("Received event:", json.dumps(event, indent=2))
 
+    #Maintenance command: rebuild the TSQL index from the tags of every TSQL file.
+    if event.get("Command") == REBUILD_TSQL_INDEX_COMMAND:
+        entries = rebuild_tsql_index_from_files(event["Bucket"])
+        return {"statusCode": 200, "message": f"TSQL index rebuilt with {len(entries)} entries."}
+
     # Retrieve bucket name and file key from the S3 event
     bucket_name = event['Records'][0]['s3']['bucket']['name']
     file_key = event['Records'][0]['s3']['object']['key']
@@ -58,7 +70,18 @@ def lambda_handler(event, context):
     print("File key:", file_key)
     print("Root folder name:", folder_name)
 
-    
+    #Start the object session: tags and metadata of the file are read once and tag writes are sent once.
+    start_object_session(event)
+
+    try:
+        return process_file_event(event, context, bucket_name, file_key, folder_name)
+    finally:
+        #Write the tags buffered by the object session, also when processing stopped with an error.
+        flush_object_tags()
+
+
+def process_file_event(event, context, bucket_name, file_key, folder_name):
+    """Routes an S3 event for a file to the InitialUpload, ConversionFiles or TSQLFiles processing."""
 
     #test using SQL Helper function
     #connection_str = get_aws_secret("Hacienda_ERP_Test_MSSQL_text")
@@ -75,8 +98,6 @@ def lambda_handler(event, context):
         # Adding the File Cateogry Tag.
         tagsfromfilename["File Category"] = "Extract"
 
-        #check if file has correct encoding (UTF-8) and no invalid characters.
-
         #check if tags form a valid table and date/time values are valid and within range
         tags = validate_tag_values(tagsfromfilename)
         print(f"In lambda_function InitialUpload after running validate_tag_values tags are: {tags}.") #For troubleshooting. 
@@ -109,10 +130,28 @@ def lambda_handler(event, context):
                 #errors_and_warnings["Test Validation"] = "Fail"
                 tagsfromfilename["Errors and Warnings"] = errors_and_warnings
 
+            #check if file has correct encoding (UTF-8) and no invalid characters.
+            #Invalid bytes are still dropped when the file is read, so they are reported as a warning and do not stop the file.
+            encoding_report = validate_file_encoding(bucket_name, file_key)
+            if encoding_report["Issue Count"]:
+                tagsfromfilename["Errors and Warnings"]["UTF-8 Encoding Validation"] = "Warning"
+                parent_file_name = file_key.split('/')[-1]
+                tags_for_encoding_validation_file = tagsfromfilename.copy()
+                tags_for_encoding_validation_file["File Category"] = "Encoding Validation"
+                tags_for_encoding_validation_file["Parent File Name"] = parent_file_name
+                # Get the file_key last modified date and time and apply formatting.
+                last_modified = event['Records'][0]['eventTime']  # This is a string
+                last_modified_dt = datetime.strptime(last_modified, "%Y-%m-%dT%H:%M:%S.%fZ")  # Convert to datetime
+                last_modified_formatted = last_modified_dt.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
+
+                #Generate validation file name.
+                encoding_validation_file_name = f"InitialUploadErrors/{last_modified_formatted} {parent_file_name}/{parent_file_name} (Encoding Validation).xlsx"
+                generate_encoding_validation_file(tags_for_encoding_validation_file, encoding_validation_file_name, encoding_report)
+
             print(f"In lambda_function after updating tagsfromfilename tags are: {tagsfromfilename}.") #For troubleshooting.
             
             #Add tags to file
-            add_tags_to_s3_object(bucket_name, file_key, tagsfromfilename)
+            set_object_tags(bucket_name, file_key, tagsfromfilename)
             #print(tagsfromfilename) #for troubleshooting
 
             #Call the validateHeader function.
@@ -134,7 +173,7 @@ def lambda_handler(event, context):
             
 
             #Add tags to file even though they where not validated because they can be used for error reporting.
-            add_tags_to_s3_object(bucket_name, file_key,tagsfromfilename)
+            set_object_tags(bucket_name, file_key,tagsfromfilename)
 
             #placeholder to create file output and other actions (file relocation, etc.).
             print(f"Initial Upload File not expected based on tag values: {tagsfromfilename}")
@@ -170,15 +209,22 @@ def lambda_handler(event, context):
             relocate_file(bucket_name, file_key, tagsfromfilename, None)
 
     elif folder_name == "ConversionFiles":
-        #load the file
-        if load_file(bucket_name, file_key):
+        #Dataset context for this invocation: load_file keeps the parsed frame here so the split does not read the file again.
+        dataset = {}
+
+        #load the file. Large files may be handed to a new invocation that resumes from a checkpoint.
+        file_loaded = load_file(bucket_name, file_key, context=context, dataset=dataset)
+        if file_loaded is False:
+            print(f"Load of {file_key} continues in another invocation.") #For troubleshooting.
+        elif file_loaded:
             #Get the BU Split field
             bu_split_field = get_bu_split_field(bucket_name, file_key)
 
             if bu_split_field:
                 #Split the file bu BU
                 #Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key,'BUSINESS_UNIT_AS_BUSINESS_UNIT')
-                Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key,bu_split_field)
+                split_output_format = get_split_output_format(bucket_name, file_key)
+                Split_CSV_File_By_BU_FiveCharacters(bucket_name, file_key,bu_split_field, dataset.get("frame"), split_output_format)
             else:
                 #Placeholder for logic if there's no BU Plit field defined for the table.
                 print(f"There is no BU Split Field defined for {file_key}") #For troubleshooting.
@@ -187,11 +233,11 @@ def lambda_handler(event, context):
             tags = get_tags_from_file(bucket_name, file_key)
             table_name = tags.get("Table Name")
             mock_number = tags.get("Mock Number")
-            sql_stmnt = (
-                f"UPDATE SETUP_CONVERSION_PLAN_{mock_number} SET file_expected = 'No' WHERE table_name = '{table_name}';"
-            )
-            print(f"SQL Statement for updating File_Expected: {sql_stmnt}") #For troubleshooting.
-            update_stmnt(sql_stmnt)
+            print(f"Updating File_Expected of {table_name} in {mock_number}") #For troubleshooting.
+            run_update("mark_file_not_expected", mock_number, (table_name,))
+
+            #The cached setup metadata of this mock no longer matches the table.
+            invalidate_setup_metadata(mock_number)
 
     elif folder_name == "TSQLFiles":
         #Retrieve tags from file name.
@@ -207,11 +253,14 @@ def lambda_handler(event, context):
             print(f"In lambda_function after updating tagsfromfilename tags are: {tagsfromfilename}.") #For troubleshooting.
 
             #Add tags to file
-            add_tags_to_s3_object(bucket_name, file_key,tagsfromfilename)
+            set_object_tags(bucket_name, file_key,tagsfromfilename)
+
+            #Point the TSQL index to this file so conversion loads find it with one read.
+            update_tsql_index(bucket_name, file_key.replace("+", " "), tagsfromfilename)
         
         else:
             #Add tags to file even though they where not validated because they can be used for error reporting.
-            add_tags_to_s3_object(bucket_name, file_key,tagsfromfilename)
+            set_object_tags(bucket_name, file_key,tagsfromfilename)
 
             #When the Table Name is not found in the SQL Table.
             print(f"TSQL Load File not expected based on tag values: {tagsfromfilename}")
@@ -219,7 +268,3 @@ def lambda_handler(event, context):
         
     else:
         return {"error": f"Unknown folder: {folder_name}"}
-
-    
-    
-    
@@ -0,0 +1,165 @@
+import json
+import hashlib
+import boto3
+from db_connection_pool import database_connection
+from staging_table import build_load_staging_table_name, drop_staging_table
+
+lambda_client = boto3.client("lambda")
+
+# Table holding one progress row per conversion file that is being loaded in several invocations.
+# The row is written in the same transaction as the staged batch it describes, so a timeout between
+# the two cannot make a continuation stage the same batch again.
+LOAD_PROGRESS_TABLE = "LOAD_PROGRESS"
+
+# Stop starting new batches when less than this much time (plus the slowest batch so far) is left.
+DEADLINE_MARGIN_MS = 30000
+
+
+class LoadProgressError(Exception):
+    """The load progress of a streamed file could not be read; the file itself may be fine."""
+
+
+def get_load_progress_key(csv_bucket_name, csv_file_key):
+    """Returns the primary key of a file's progress row (file keys are too long for an index key)."""
+    return hashlib.sha1(f"{csv_bucket_name}/{csv_file_key}".encode("utf-8")).hexdigest()
+
+
+def ensure_load_progress_table(cursor):
+    """Creates the progress table the first time a streamed load runs against the database."""
+    cursor.execute(
+        f"IF OBJECT_ID('{LOAD_PROGRESS_TABLE}', 'U') IS NULL "
+        f"CREATE TABLE {LOAD_PROGRESS_TABLE} ("
+        "LoadKey char(40) NOT NULL PRIMARY KEY, "
+        "Bucket nvarchar(255) NOT NULL, "
+        "FileKey nvarchar(1024) NOT NULL, "
+        "ETag varchar(100) NOT NULL, "
+        "Header varbinary(max) NOT NULL, "
+        "ByteOffset bigint NOT NULL, "
+        "RowsCommitted bigint NOT NULL, "
+        "UpdatedAt datetime2 NOT NULL DEFAULT SYSUTCDATETIME());"
+    )
+
+
+def build_load_checkpoint(csv_bucket_name, csv_file_key, etag, size, header, offset, rows_committed):
+    """Builds the checkpoint state for a load that staged every row before byte 'offset'."""
+    return {
+        "Bucket": csv_bucket_name,
+        "Key": csv_file_key,
+        "ETag": etag,
+        "Size": size,
+        "Header": header,
+        "Offset": offset,
+        "Rows Committed": rows_committed
+    }
+
+
+def update_load_checkpoint(checkpoint, header, offset, rows_committed):
+    """Records that a batch ending at byte 'offset' with 'rows_committed' rows was staged."""
+    checkpoint["Header"] = header
+    checkpoint["Offset"] = offset
+    checkpoint["Rows Committed"] += rows_committed
+    return checkpoint
+
+
+def get_checkpoint_header(checkpoint):
+    """Returns the CSV header line bytes stored in a checkpoint."""
+    return bytes(checkpoint["Header"])
+
+
+def read_load_checkpoint(csv_bucket_name, csv_file_key, etag, size=None):
+    """
+    Returns the saved checkpoint for the file, or None if no batch of this version of the file was staged yet.
+    The progress (and staging table) of a different version of the file (different ETag) is discarded.
+    Raises LoadProgressError when the progress table cannot be read.
+    """
+    load_key = get_load_progress_key(csv_bucket_name, csv_file_key)
+    try:
+        with database_connection() as cnxn:
+            cursor = cnxn.cursor()
+            ensure_load_progress_table(cursor)
+            cursor.execute(f"SELECT ETag, Header, ByteOffset, RowsCommitted FROM {LOAD_PROGRESS_TABLE} WHERE LoadKey = ?;", (load_key,))
+            row = cursor.fetchone()
+            if row and row.ETag != etag:
+                print(f"Discarding the load progress of {csv_file_key} because it belongs to ETag {row.ETag}.") #For troubleshooting.
+                drop_staging_table(cursor, build_load_staging_table_name(csv_bucket_name, csv_file_key, row.ETag))
+                cursor.execute(f"DELETE FROM {LOAD_PROGRESS_TABLE} WHERE LoadKey = ?;", (load_key,))
+                row = None
+            cnxn.commit()
+            cursor.close()
+    except Exception as e:
+        raise LoadProgressError(f"Could not read the load progress of {csv_file_key}: {e}") from e
+
+    if not row or not row.ByteOffset:
+        return None
+
+    checkpoint = build_load_checkpoint(csv_bucket_name, csv_file_key, etag, size, bytes(row.Header), row.ByteOffset, row.RowsCommitted)
+    print(f"Found load checkpoint for {csv_file_key}: offset {checkpoint['Offset']}, {checkpoint['Rows Committed']} rows committed.") #For troubleshooting.
+    return checkpoint
+
+
+def save_load_checkpoint(cursor, checkpoint):
+    """
+    Writes the checkpoint to the file's progress row. Does not commit; call it in the transaction
+    that stages the batch so both are committed together.
+    """
+    load_key = get_load_progress_key(checkpoint["Bucket"], checkpoint["Key"])
+    cursor.execute(
+        f"UPDATE {LOAD_PROGRESS_TABLE} SET ETag = ?, Header = ?, ByteOffset = ?, RowsCommitted = ?, UpdatedAt = SYSUTCDATETIME() WHERE LoadKey = ?;",
+        (checkpoint["ETag"], checkpoint["Header"], checkpoint["Offset"], checkpoint["Rows Committed"], load_key)
+    )
+    if cursor.rowcount == 0:
+        cursor.execute(
+            f"INSERT INTO {LOAD_PROGRESS_TABLE} (LoadKey, Bucket, FileKey, ETag, Header, ByteOffset, RowsCommitted) VALUES (?, ?, ?, ?, ?, ?, ?);",
+            (load_key, checkpoint["Bucket"], checkpoint["Key"], checkpoint["ETag"], checkpoint["Header"], checkpoint["Offset"], checkpoint["Rows Committed"])
+        )
+
+
+def delete_load_checkpoint(csv_bucket_name, csv_file_key, cursor=None):
+    """
+    Removes the file's progress row once the file is fully loaded (or moved to the error folder).
+    With a cursor the delete joins the caller's transaction; without one it runs on its own and errors are only logged.
+    """
+    tsql_query = f"DELETE FROM {LOAD_PROGRESS_TABLE} WHERE LoadKey = ?;"
+    params = (get_load_progress_key(csv_bucket_name, csv_file_key),)
+    if cursor is not None:
+        cursor.execute(tsql_query, params)
+        return
+    try:
+        with database_connection() as cnxn:
+            cursor = cnxn.cursor()
+            cursor.execute(tsql_query, params)
+            cnxn.commit()
+            cursor.close()
+    except Exception as e:
+        print(f"Error deleting the load progress of {csv_file_key}: {e}")
+
+
+def is_deadline_near(context, slowest_batch_ms=0):
+    """True when the invocation does not have time left for another batch."""
+    if context is None:
+        return False
+    return context.get_remaining_time_in_millis() < DEADLINE_MARGIN_MS + slowest_batch_ms
+
+
+def invoke_load_continuation(context, checkpoint):
+    """
+    Re-invokes this Lambda asynchronously with an S3-style event for the same file.
+    The next invocation finds the checkpoint and resumes from its offset.
+    """
+    continuation_event = {
+        "Records": [{
+            "eventTime": "",
+            "s3": {
+                "bucket": {"name": checkpoint["Bucket"]},
+                "object": {"key": checkpoint["Key"]}
+            }
+        }],
+        "Load Continuation": True
+    }
+    response = lambda_client.invoke(
+        FunctionName=context.invoked_function_arn,
+        InvocationType="Event",
+        Payload=json.dumps(continuation_event).encode("utf-8")
+    )
+    print(f"Re-invoked {context.function_name} to continue loading {checkpoint['Key']} from offset {checkpoint['Offset']}. Status: {response.get('StatusCode')}")
+    return response
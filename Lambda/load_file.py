@@ -1,15 +1,233 @@
 import boto3
-import pandas as pd
-import pyodbc
-import io
-import json
-from execute_tsql import insert_rows
-from find_file_by_tags import find_tsql_load_file_by_tags
+import time
+from execute_tsql import insert_rows, write_insert_rows_error, write_param_count_error
+from bulk_insert import bulk_insert
+from db_connection_pool import database_connection, handle_login_failure
+from staging_table import (STAGING_TABLE_HINT, build_load_staging_table_name, build_staging_insert_statement,
+                           create_staging_table, switch_in_staging_table, drop_staging_table)
+from find_file_by_tags import get_tsql_load_statement_by_tags
 from get_tags_from_file import get_tags_from_file
-from relocate_file import relocate_file, relocate_file_specified_new_key
+from object_session import get_object_head, remember_object_head
+from relocate_file import relocate_file_specified_new_key
 from generate_validation_file import generate_conversion_file_upload_error_file, generate_tsql_not_found_error_file
+from stream_csv import iter_csv_record_batches, parse_csv_batch
+from csv_frame import read_csv_frame
+from load_checkpoint import (LoadProgressError, build_load_checkpoint, update_load_checkpoint, get_checkpoint_header,
+                             read_load_checkpoint, ensure_load_progress_table, save_load_checkpoint, delete_load_checkpoint,
+                             is_deadline_near, invoke_load_continuation)
 
-def load_file(csv_bucket_name, csv_file_key):
+# Files at or above this size are streamed into the database in batches instead of read whole.
+STREAMING_THRESHOLD_BYTES = 64 * 1024 * 1024
+
+def handle_csv_read_error(s3_client, csv_bucket_name, csv_file_key, e):
+    """Writes the CSV read error file and moves the parent file to ConversionFileErrors."""
+    print(f"Error reading CSV file: {e}") #For troubleshooting.
+
+    #Get parent file name and other data needed.
+    parent_file_name = csv_file_key.split('/')[-1]
+    parent_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
+    print(f"parent_file_tags are: {parent_file_tags}") #For troubleshooting.
+    tags_for_csv_file_read_error = parent_file_tags.copy()
+    print(f"tags_for_csv_file_read_error are: {tags_for_csv_file_read_error}") #For troubleshooting.
+    #Get the parent file folders to be used in error file key
+    parts = csv_file_key.strip('/').split('/')
+    folders_for_error_file_key = '/'.join(parts[1:-1])
+    print(f"In load file CSV File Read Error the folders_for_error_file_key is: {folders_for_error_file_key}")
+
+    #Update "Errors and Warnings" tag in parent file
+    if parent_file_tags.get('Errors and Warnings'):
+        parent_file_tags["Errors and Warnings"] = f"{parent_file_tags.get('Errors and Warnings')} - CSV File Read: Fail"
+        #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+    else:
+        parent_file_tags["Errors and Warnings"] = "CSV File Read: Fail"
+        #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+    
+    #Update tags that will be uploaded to validation error file.
+    tags_for_csv_file_read_error["File Category"] = "CSV Read Error"
+    tags_for_csv_file_read_error["Parent File Name"] = parent_file_name
+
+    # Get the parent file last modified date and time and apply formatting.
+    response = get_object_head(csv_bucket_name, csv_file_key)
+    last_modified = response["LastModified"]  
+    last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
+
+    #Generate validation file name.
+    error_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name} (CSV File Read Error).txt"
+    generate_conversion_file_upload_error_file(tags_for_csv_file_read_error, error_file_key, e)
+
+    #Relocate the parent file.
+    new_parent_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name}"
+    relocate_file_specified_new_key(csv_bucket_name, csv_file_key, new_parent_file_key, parent_file_tags)
+
+def discard_staged_rows(staging_table, csv_bucket_name, csv_file_key):
+    """Drops the staging table and the progress row of a streamed load that will not be switched in."""
+    try:
+        with database_connection() as cnxn:
+            cursor = cnxn.cursor()
+            drop_staging_table(cursor, staging_table)
+            delete_load_checkpoint(csv_bucket_name, csv_file_key, cursor)
+            cnxn.commit()
+            cursor.close()
+    except Exception as e:
+        print(f"Error dropping staging table {staging_table}: {e}")
+
+def load_row_batches_in_one_transaction(tsql_statement, first_batch, first_rows, record_batches, checkpoint):
+    """
+    Inserts every streamed batch with the statement as written and commits once at the end.
+    Used when the TSQL load statement cannot be retargeted at a staging table; the load cannot be
+    continued in another invocation, but the target table still gets every row or none.
+
+    Returns (True, None) when the rows were committed, or (kind, error) where kind is "csv" or "insert".
+    """
+    batch, rows = first_batch, first_rows
+    try:
+        with database_connection() as cnxn:
+            while batch:
+                if rows:
+                    # Only called for statements that could not be parsed; no need to try again.
+                    bulk_insert(cnxn, tsql_statement, rows, statement_info={})
+                    checkpoint["Rows Committed"] += len(rows)
+                try:
+                    batch = next(record_batches, None)
+                    rows = parse_csv_batch(batch[0], batch[1]) if batch else []
+                except Exception as e:
+                    cnxn.rollback()
+                    return "csv", e
+            cnxn.commit()
+    except Exception as e:
+        handle_login_failure(e)
+        return "insert", e
+    return True, None
+
+def load_row_batches(s3_client, tsql_entry, first_batch, first_rows, record_batches, checkpoint,
+                     csv_bucket_name, csv_file_key, context=None):
+    """
+    Streams the parsed batches into a permanent staging table kept for this version of the file and
+    moves them into the target table with one INSERT ... SELECT after the last batch, so the target table
+    gets every row of the file or none. A checkpoint is committed with every staged batch. When the Lambda is
+    close to its timeout the load stops between batches and the function re-invokes itself to continue
+    staging from the checkpoint.
+
+    tsql_entry is the cached TSQL load statement with its analysis (see tsql_statement_cache).
+
+    Returns True when every batch was inserted, False when the load was handed to a continuation
+    and None when a batch failed (error file already written, staged rows dropped).
+    """
+    tsql_statement = tsql_entry["Statement"]
+    expected_params = tsql_entry["Expected Params"]
+    staging_table = build_load_staging_table_name(csv_bucket_name, csv_file_key, checkpoint["ETag"])
+    if first_rows and len(first_rows[0]) != expected_params:
+        print(f"Provided param count not equal to expected param count. Expected parameters: {expected_params}, Provided parameters: {len(first_rows[0])}")
+        if checkpoint["Offset"] > 0:
+            discard_staged_rows(staging_table, csv_bucket_name, csv_file_key)
+        write_param_count_error(csv_bucket_name, csv_file_key, expected_params, len(first_rows[0]))
+        return None
+
+    statement_info = tsql_entry["Statement Info"]
+    if not statement_info:
+        print("In load_row_batches the TSQL load statement cannot be staged; loading every batch in one transaction.") #For troubleshooting.
+        if checkpoint["Offset"] > 0:
+            # Rows staged by an earlier invocation cannot be switched in without the parsed statement.
+            discard_staged_rows(staging_table, csv_bucket_name, csv_file_key)
+            write_insert_rows_error(csv_bucket_name, csv_file_key, "The TSQL load statement changed while the file was being loaded.")
+            return None
+        loaded, error = load_row_batches_in_one_transaction(tsql_statement, first_batch, first_rows, record_batches, checkpoint)
+    else:
+        loaded, error = stage_row_batches(tsql_statement, statement_info, staging_table, first_batch, first_rows,
+                                          record_batches, checkpoint, context)
+        if loaded is False:
+            return False
+        if error is not None:
+            # Nothing reached the target table; the staged rows are thrown away.
+            discard_staged_rows(staging_table, csv_bucket_name, csv_file_key)
+
+    if loaded == "csv":
+        handle_csv_read_error(s3_client, csv_bucket_name, csv_file_key, error)
+        return None
+    if loaded == "insert":
+        print(f"Error executing T-SQL: {error}")
+        write_insert_rows_error(csv_bucket_name, csv_file_key, error)
+        return None
+
+    print(f"In load_row_batches finished streaming {checkpoint['Rows Committed']} rows.") #For troubleshooting.
+    return True
+
+def stage_row_batches(tsql_statement, statement_info, staging_table, first_batch, first_rows, record_batches,
+                      checkpoint, context=None):
+    """
+    Inserts the batches into staging_table, committing each one, and switches the staging table into
+    the target table after the last batch.
+
+    Returns (True, None) when the rows were switched in, (False, None) when the load was handed to a
+    continuation, or (kind, error) where kind is "csv" or "insert".
+    """
+    staging_insert_statement = build_staging_insert_statement(statement_info, staging_table, STAGING_TABLE_HINT)
+    batch, rows = first_batch, first_rows
+    batch_number = 1
+    slowest_batch_ms = 0
+    try:
+        with database_connection() as cnxn:
+            cursor = cnxn.cursor()
+            if checkpoint["Offset"] == 0:
+                # A new load starts from an empty staging table.
+                ensure_load_progress_table(cursor)
+                drop_staging_table(cursor, staging_table)
+                create_staging_table(cursor, statement_info, staging_table)
+                save_load_checkpoint(cursor, checkpoint)
+                cnxn.commit()
+
+            while batch:
+                header, batch_bytes, end_offset = batch
+                batch_start = time.monotonic()
+                if rows:
+                    bulk_insert(cnxn, staging_insert_statement, rows)
+
+                # Everything before end_offset is staged; a continuation resumes from here.
+                # The checkpoint is committed in the same transaction as the batch.
+                save_load_checkpoint(cursor, update_load_checkpoint(checkpoint, header, end_offset, len(rows)))
+                cnxn.commit()
+                print(f"In stage_row_batches batch {batch_number} staged in {staging_table}, {checkpoint['Rows Committed']} rows staged so far.") #For troubleshooting.
+
+                try:
+                    batch = next(record_batches, None)
+                    rows = parse_csv_batch(batch[0], batch[1]) if batch else []
+                except Exception as e:
+                    return "csv", e
+                batch_number += 1
+
+                slowest_batch_ms = max(slowest_batch_ms, (time.monotonic() - batch_start) * 1000)
+                if batch and is_deadline_near(context, slowest_batch_ms):
+                    print(f"In stage_row_batches stopping before batch {batch_number} because the Lambda timeout is near.") #For troubleshooting.
+                    invoke_load_continuation(context, checkpoint)
+                    return False, None
+
+            # The only transaction that touches the target table. DDL is transactional in SQL Server,
+            # so the staging table and the progress row are removed together with the switch-in.
+            moved_rows = switch_in_staging_table(cursor, statement_info, staging_table, STAGING_TABLE_HINT)
+            drop_staging_table(cursor, staging_table)
+            delete_load_checkpoint(checkpoint["Bucket"], checkpoint["Key"], cursor)
+            cnxn.commit()
+            cursor.close()
+            print(f"In stage_row_batches moved {moved_rows} rows into {statement_info['table']}.") #For troubleshooting.
+    except Exception as e:
+        handle_login_failure(e)
+        return "insert", e
+    return True, None
+
+def load_file(csv_bucket_name, csv_file_key, streaming=None, load_mode=None, context=None, dataset=None):
+    """
+    Loads a conversion CSV file into SQL Server using the matching TSQL load file.
+
+    :param streaming: True to read the S3 body in chunks and insert in fixed-size batches,
+                      False to read the whole file at once, None to decide from the object size.
+    :param load_mode: insert_rows load mode (see execute_tsql). None uses the LOAD_MODE environment variable.
+                      Streamed files always go through a staging table (see load_row_batches).
+    :param context: Lambda context. When given, a streaming load checkpoints its progress and continues
+                    in a new invocation before the timeout.
+    :param dataset: Per-invocation dataset context (dictionary). When given, the parsed frame is stored in
+                    dataset["frame"] so later stages of the same invocation reuse it instead of reading the file again.
+    :return: True when the file was loaded, False when the load continues in another invocation, None on error.
+    """
     
     print("In load_file.") #for troubleshooting
 
@@ -22,71 +240,64 @@ def load_file(csv_bucket_name, csv_file_key):
         # --- Retrieve CSV file from S3 ---
     try:
         csv_response = s3_client.get_object(Bucket=csv_bucket_name, Key=csv_file_key)
-        file_content = csv_response['Body'].read().decode('utf-8', errors="ignore")
-        
-        # Extract header line to build a dtype mapping (assume all columns are strings)
-        header_line = file_content.splitlines()[0]
-        header_columns = [col.strip() for col in header_line.split(',')]
-        dtype_mapping = {col: "string" for col in header_columns if col}
-        
-        # Load the CSV content into a DataFrame using the dynamic dtype mapping
-        data = pd.read_csv(io.StringIO(file_content), dtype=dtype_mapping)
-        data = data.fillna("")
-    except Exception as e:
-        print(f"Error reading CSV file: {e}") #For troubleshooting.
-
-        #Get parent file name and other data needed.
-        parent_file_name = csv_file_key.split('/')[-1]
-        parent_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
-        print(f"parent_file_tags are: {parent_file_tags}") #For troubleshooting.
-        tags_for_csv_file_read_error = parent_file_tags.copy()
-        print(f"tags_for_csv_file_read_error are: {tags_for_csv_file_read_error}") #For troubleshooting.
-        #Get the parent file folders to be used in error file key
-        parts = csv_file_key.strip('/').split('/')
-        folders_for_error_file_key = '/'.join(parts[1:-1])
-        print(f"In load file CSV File Read Error the folders_for_error_file_key is: {folders_for_error_file_key}")
-
-        #Update "Errors and Warnings" tag in parent file
-        if parent_file_tags.get('Errors and Warnings'):
-            parent_file_tags["Errors and Warnings"] = f"{parent_file_tags.get('Errors and Warnings')} - CSV File Read: Fail"
-            #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
+        remember_object_head(csv_bucket_name, csv_file_key, csv_response)
+        if streaming is None:
+            streaming = csv_response.get('ContentLength', 0) >= STREAMING_THRESHOLD_BYTES
+        print(f"In load_file streaming mode is {streaming}.") #For troubleshooting.
+
+        if streaming:
+            etag = csv_response.get('ETag')
+            size = csv_response.get('ContentLength', 0)
+            checkpoint = read_load_checkpoint(csv_bucket_name, csv_file_key, etag, size)
+            if checkpoint:
+                # Resume after the last committed batch instead of starting from row zero.
+                csv_response['Body'].close()
+                if checkpoint["Offset"] >= size:
+                    record_batches = iter([])
+                else:
+                    csv_response = s3_client.get_object(Bucket=csv_bucket_name, Key=csv_file_key, IfMatch=etag, Range=f"bytes={checkpoint['Offset']}-")
+                    record_batches = iter_csv_record_batches(csv_response['Body'], header=get_checkpoint_header(checkpoint), start_offset=checkpoint["Offset"])
+            else:
+                checkpoint = build_load_checkpoint(csv_bucket_name, csv_file_key, etag, size, b"", 0, 0)
+                record_batches = iter_csv_record_batches(csv_response['Body'])
+
+            # Parse only the first batch here so CSV errors are still caught before the TSQL lookup.
+            first_batch = next(record_batches, None)
+            first_rows = parse_csv_batch(first_batch[0], first_batch[1]) if first_batch else []
         else:
-            parent_file_tags["Errors and Warnings"] = "CSV File Read: Fail"
-            #add_tags_to_s3_object(csv_bucket_name, csv_file_key, parent_file_tags)
-        
-        #Update tags that will be uploaded to validation error file.
-        tags_for_csv_file_read_error["File Category"] = "CSV Read Error"
-        tags_for_csv_file_read_error["Parent File Name"] = parent_file_name
-
-        # Get the parent file last modified date and time and apply formatting.
-        response = s3_client.head_object(Bucket=csv_bucket_name, Key=csv_file_key)
-        last_modified = response["LastModified"]  
-        last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
-
-        #Generate validation file name.
-        error_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name} (CSV File Read Error).txt"
-        generate_conversion_file_upload_error_file(tags_for_csv_file_read_error, error_file_key, e)
-
-        #Relocate the parent file.
-        new_parent_file_key = f"ConversionFileErrors/{folders_for_error_file_key}/{last_modified_formatted} {parent_file_name}/{parent_file_name}"
-        relocate_file_specified_new_key(csv_bucket_name, csv_file_key, new_parent_file_key, parent_file_tags)
+            # Load the CSV into a DataFrame with every column as a string
+            data = read_csv_frame(csv_bucket_name, csv_file_key, csv_response)
+            if dataset is not None:
+                dataset["frame"] = data
+            data = data.fillna("")
+    except LoadProgressError as e:
+        # Not a problem with the CSV: fail the invocation so the event is retried instead of filing the file as unreadable.
+        print(f"Error reading load progress: {e}")
+        raise
+    except Exception as e:
+        handle_csv_read_error(s3_client, csv_bucket_name, csv_file_key, e)
         return
     
     # --- Retrieve SQL statement file from S3 ---
     try:
         print(f"Entered Retrieving TSQL File.") #For Troubleshooting.
         csv_file_tags = get_tags_from_file(csv_bucket_name, csv_file_key)
-        result = find_tsql_load_file_by_tags(csv_bucket_name, csv_file_tags)
+        # Downloaded and parsed only when the TSQL file changed since the last load in this container.
+        result = get_tsql_load_statement_by_tags(csv_bucket_name, csv_file_tags)
         if result:
-            found_bucket, found_file_key = result
-            print(f"In load file; Find tsql file by tags Bucket: {found_bucket}") #for troubleshooting
+            found_file_key, tsql_entry = result
             print(f"In load file; Find tsql file by tags File Key: {found_file_key}") #for troubleshooting
-            sql_load_file = s3_client.get_object(Bucket=found_bucket, Key=found_file_key)
-            tsql_statement = sql_load_file['Body'].read().decode('utf-8').strip()
+            tsql_statement = tsql_entry["Statement"]
             print(tsql_statement) #for troubleshooting
             # --- Execute T-SQL using the rows from the CSV ---
+            if streaming:
+                loaded = load_row_batches(s3_client, tsql_entry, first_batch, first_rows, record_batches, checkpoint,
+                                          csv_bucket_name, csv_file_key, context)
+                if not loaded:
+                    return loaded
+                print("In load_file File successfully imported") #For troubleshooting
             # data.values.tolist() converts the DataFrame into a list of rows.
-            if insert_rows(tsql_statement, data.values.tolist(), csv_bucket_name, csv_file_key):
+            elif insert_rows(tsql_statement, data.values.tolist(), csv_bucket_name, csv_file_key, load_mode, tsql_entry=tsql_entry):
                 print("In load_file File successfully imported") #For troubleshooting
         else:
             print(f"No matching tsql load file file found for tags {csv_file_tags}.")
@@ -115,7 +326,7 @@ def load_file(csv_bucket_name, csv_file_key):
             tags_for_tsql_not_found_error["Parent File Name"] = parent_file_name
 
             # Get the parent file last modified date and time and apply formatting.
-            response = s3_client.head_object(Bucket=csv_bucket_name, Key=csv_file_key)
+            response = get_object_head(csv_bucket_name, csv_file_key)
             last_modified = response["LastModified"]  
             last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
 
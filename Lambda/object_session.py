@@ -0,0 +1,146 @@
+import boto3
+from datetime import datetime, timezone
+from add_tags_to_s3_object import add_tags_to_s3_object, stringify_values
+
+s3_client = boto3.client("s3")
+
+# Per-invocation cache of S3 object metadata, reset by start_object_session at the start of lambda_handler.
+#   "Heads":        (bucket, key) -> {"ContentLength", "ETag", "LastModified", ...}
+#   "Tags":         (bucket, key) -> tag dictionary as last read or written
+#   "Pending Tags": (bucket, key) -> tag dictionary not yet written to S3
+#   "Stats":        counters printed when the session is flushed
+object_session = {"Heads": {}, "Tags": {}, "Pending Tags": {}, "Stats": {}}
+
+
+def get_session_key(bucket_name, file_key):
+    """Keys are stored the way the rest of the code addresses them ("+" replaced by space)."""
+    return (bucket_name, file_key.replace("+", " "))
+
+
+def count(stat):
+    object_session["Stats"][stat] = object_session["Stats"].get(stat, 0) + 1
+
+
+def start_object_session(event):
+    """
+    Starts a new session for an invocation and seeds the triggering object's size, ETag and
+    time from the S3 event record, so they do not have to be fetched with head_object.
+    """
+    object_session["Heads"] = {}
+    object_session["Tags"] = {}
+    object_session["Pending Tags"] = {}
+    object_session["Stats"] = {}
+
+    try:
+        record = event['Records'][0]
+        bucket_name = record['s3']['bucket']['name']
+        file_key = record['s3']['object']['key']
+    except (KeyError, IndexError, TypeError):
+        return
+
+    s3_object = record['s3']['object']
+    head = {}
+    if s3_object.get('size') is not None:
+        head["ContentLength"] = s3_object['size']
+    if s3_object.get('eTag'):
+        # head_object returns the ETag quoted.
+        head["ETag"] = f'"{s3_object["eTag"]}"'
+    if record.get('eventTime'):
+        head["LastModified"] = datetime.strptime(record['eventTime'], "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+
+    # Continuation events carry no metadata; only a complete record replaces the HEAD request.
+    if len(head) == 3:
+        object_session["Heads"][get_session_key(bucket_name, file_key)] = head
+        print(f"Object session seeded from the event for {file_key}: {head}") #For troubleshooting.
+
+
+def remember_object_head(bucket_name, file_key, response):
+    """Stores the metadata of a head_object or get_object response for later lookups."""
+    object_session["Heads"][get_session_key(bucket_name, file_key)] = {
+        "ContentLength": response.get("ContentLength"),
+        "ETag": response.get("ETag"),
+        "LastModified": response.get("LastModified")
+    }
+
+
+def get_object_head(bucket_name, file_key):
+    """Returns ContentLength, ETag and LastModified for an object, calling head_object at most once per session."""
+    session_key = get_session_key(bucket_name, file_key)
+    head = object_session["Heads"].get(session_key)
+    if head is not None:
+        count("Head Hits")
+        return head
+
+    count("Head Misses")
+    response = s3_client.head_object(Bucket=session_key[0], Key=session_key[1])
+    remember_object_head(bucket_name, file_key, response)
+    return object_session["Heads"][session_key]
+
+
+def get_object_tags(bucket_name, file_key):
+    """Returns a copy of an object's tags, calling get_object_tagging at most once per session."""
+    session_key = get_session_key(bucket_name, file_key)
+    tags = object_session["Tags"].get(session_key)
+    if tags is not None:
+        count("Tag Hits")
+        return dict(tags)
+
+    count("Tag Misses")
+    tagging_response = s3_client.get_object_tagging(Bucket=session_key[0], Key=session_key[1])
+    tags = {tag['Key']: tag['Value'] for tag in tagging_response.get('TagSet', [])}
+    object_session["Tags"][session_key] = tags
+    return dict(tags)
+
+
+def set_object_tags(bucket_name, file_key, tags):
+    """
+    Replaces an object's tags in the session. The write is buffered and sent once by flush_object_tags;
+    reads through get_object_tags in the meantime already see the new tags.
+    """
+    session_key = get_session_key(bucket_name, file_key)
+    # Keep the values the way S3 returns them (nested dictionaries flattened to strings).
+    tags = stringify_values(tags)
+    object_session["Tags"][session_key] = tags
+    object_session["Pending Tags"][session_key] = dict(tags)
+    count("Tag Writes")
+
+
+def get_pending_tags(bucket_name, file_key):
+    """Returns the tags buffered for an object, or None when there are no unwritten tags."""
+    return object_session["Pending Tags"].get(get_session_key(bucket_name, file_key))
+
+
+def flush_object_tags(bucket_name=None, file_key=None):
+    """
+    Writes buffered tags to S3. Without arguments every pending object is flushed; call it at the end
+    of the invocation. Copies set the pending tags themselves (see relocate_file).
+    Every object is attempted; the first failure is raised after the rest were written.
+    """
+    if bucket_name is None:
+        session_keys = list(object_session["Pending Tags"])
+    else:
+        session_keys = [get_session_key(bucket_name, file_key)]
+
+    first_error = None
+    for session_key in session_keys:
+        tags = object_session["Pending Tags"].pop(session_key, None)
+        if tags is not None:
+            try:
+                add_tags_to_s3_object(session_key[0], session_key[1], tags)
+                count("Tag Flushes")
+            except Exception as e:
+                print(f"Could not write the tags of {session_key[1]}: {e}")
+                first_error = first_error or e
+
+    if bucket_name is None:
+        print(f"Object session stats: {object_session['Stats']}") #For troubleshooting.
+    if first_error is not None:
+        raise first_error
+
+
+def forget_object(bucket_name, file_key):
+    """Drops an object from the session after it was moved or deleted."""
+    session_key = get_session_key(bucket_name, file_key)
+    object_session["Heads"].pop(session_key, None)
+    object_session["Tags"].pop(session_key, None)
+    object_session["Pending Tags"].pop(session_key, None)
@@ -0,0 +1,81 @@
+from db_connection_pool import pooled_connection, get_connection, release_connection
+from concurrent.futures import ThreadPoolExecutor
+from bulk_insert import bulk_insert
+from parse_tsql_statement import parse_insert_statement
+from staging_table import (build_staging_table_name, build_staging_insert_statement, create_staging_table,
+                           switch_in_staging_table, drop_staging_table)
+
+# Number of partitions (and DB connections) used by a parallel load.
+PARALLEL_PARTITIONS = 4
+
+
+def split_into_partitions(rows, partitions):
+    """Splits rows into at most 'partitions' contiguous, similarly sized slices."""
+    partition_size = -(-len(rows) // max(partitions, 1))  # Ceiling division
+    return [rows[start:start + partition_size] for start in range(0, len(rows), max(partition_size, 1))]
+
+
+def insert_partition(connection_str, staging_insert_statement, rows, partition_number):
+    """Inserts one partition into the staging table over its own connection and commits it."""
+    with pooled_connection(connection_str) as cnxn:
+        insert_stats = bulk_insert(cnxn, staging_insert_statement, rows)
+        cnxn.commit()
+        print(f"In insert_partition partition {partition_number} committed {insert_stats['rows']} rows.") #For troubleshooting.
+        return insert_stats
+
+
+def parallel_insert_rows(connection_str, tsql_statement, rows, partitions=PARALLEL_PARTITIONS, statement_info=None):
+    """
+    Inserts rows with the TSQL load statement over several connections at the same time.
+
+    Partitions are committed independently into a global temp staging table (##) and then moved
+    into the target table with one INSERT ... SELECT, so the target gets either every row or none.
+    Raises the first partition error; the staging table is always dropped.
+
+    :param statement_info: parse_insert_statement result for tsql_statement, when the caller already has it.
+    :return: Number of rows moved into the target table.
+    """
+    if statement_info is None:
+        statement_info = parse_insert_statement(tsql_statement)
+    if not statement_info:
+        raise ValueError("The TSQL load statement must be a single INSERT ... VALUES statement for a parallel load.")
+
+    staging_table = build_staging_table_name(statement_info["table"], prefix="##")
+    staging_insert_statement = build_staging_insert_statement(statement_info, staging_table)
+    row_partitions = split_into_partitions(rows, partitions)
+    print(f"In parallel_insert_rows loading {len(rows)} rows in {len(row_partitions)} partitions through {staging_table}.") #For troubleshooting.
+
+    # The owner connection keeps the global temp table alive until the switch-in is done.
+    owner_cnxn = get_connection(connection_str)
+    owner_cursor = owner_cnxn.cursor()
+    broken = False
+    try:
+        create_staging_table(owner_cursor, statement_info, staging_table)
+        owner_cnxn.commit()
+
+        with ThreadPoolExecutor(max_workers=len(row_partitions) or 1) as executor:
+            futures = [
+                executor.submit(insert_partition, connection_str, staging_insert_statement, partition_rows, number)
+                for number, partition_rows in enumerate(row_partitions, start=1)
+            ]
+            for future in futures:
+                future.result()
+
+        moved_rows = switch_in_staging_table(owner_cursor, statement_info, staging_table)
+        owner_cnxn.commit()
+        print(f"In parallel_insert_rows moved {moved_rows} rows into {statement_info['table']}.") #For troubleshooting.
+        return moved_rows
+    except Exception:
+        broken = True
+        owner_cnxn.rollback()
+        raise
+    finally:
+        try:
+            drop_staging_table(owner_cursor, staging_table)
+            owner_cnxn.commit()
+        except Exception as e:
+            # The session still owns the global temp table, so the connection must not be reused.
+            broken = True
+            print(f"Error dropping staging table {staging_table}: {e}")
+        owner_cursor.close()
+        release_connection(connection_str, owner_cnxn, broken)
@@ -0,0 +1,64 @@
+import re
+from functools import lru_cache
+
+# INSERT INTO <table> [WITH (<hints>)] (<columns>) VALUES (<placeholders>)
+INSERT_VALUES_PATTERN = re.compile(
+    r"^\s*INSERT\s+(?:INTO\s+)?(?P<table>[^\s(]+)\s*(?P<hint>WITH\s*\([^)]*\))?\s*\((?P<columns>[^)]*)\)"
+    r"\s*VALUES\s*\((?P<values>[^)]*)\)\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Optional hint line in a TSQL load file naming the table type used for TVP inserts, e.g. "-- TVP: dbo.SupplierRows"
+TVP_HINT_PATTERN = re.compile(r"^\s*--\s*TVP\s*:\s*(?P<type_name>\S+)\s*$", re.IGNORECASE | re.MULTILINE)
+
+
+def strip_tsql_comments(tsql_statement):
+    """Removes -- line comments and /* */ block comments from a T-SQL statement."""
+    tsql_statement = re.sub(r"/\*.*?\*/", " ", tsql_statement, flags=re.DOTALL)
+    return re.sub(r"--[^\n]*", " ", tsql_statement)
+
+
+# Distinct TSQL load statements whose analysis is kept by a warm container.
+PARSED_STATEMENT_CACHE_SIZE = 64
+
+
+def parse_insert_statement(tsql_statement):
+    """
+    Parses a single-row parameterized INSERT statement from a TSQL load file.
+
+    Statements are parsed once per warm container; every call returns its own copy of the result.
+
+    :param tsql_statement: Statement text, e.g. "INSERT INTO T (A, B) VALUES (?, ?)".
+    :return: Dictionary with 'table', 'table_hint', 'columns', 'values_clause', 'placeholder_count' and 'tvp_type_name',
+             or an empty dictionary if the statement is not a simple INSERT ... VALUES.
+    """
+    statement_info = dict(_parse_insert_statement(tsql_statement))
+    if statement_info:
+        statement_info["columns"] = list(statement_info["columns"])
+    return statement_info
+
+
+def count_placeholders(tsql_statement):
+    """Returns the number of ? parameters in a statement (the parameter count insert_rows expects per row)."""
+    return tsql_statement.count('?')
+
+
+@lru_cache(maxsize=PARSED_STATEMENT_CACHE_SIZE)
+def _parse_insert_statement(tsql_statement):
+    """Cached parse behind parse_insert_statement; the result is shared and must not be modified."""
+    match = INSERT_VALUES_PATTERN.match(strip_tsql_comments(tsql_statement))
+    if not match:
+        return {}
+
+    columns = [column.strip() for column in match.group('columns').split(',') if column.strip()]
+    values_clause = match.group('values').strip()
+    tvp_hint = TVP_HINT_PATTERN.search(tsql_statement)
+
+    return {
+        "table": match.group('table'),
+        "table_hint": match.group('hint') or "",
+        "columns": columns,
+        "values_clause": values_clause,
+        "placeholder_count": values_clause.count('?'),
+        "tvp_type_name": tvp_hint.group('type_name') if tvp_hint else None
+    }
@@ -0,0 +1,79 @@
+import pandas as pd
+
+# A partition spec is the extractefieldbu value from SETUP_CONVERSION_PLAN_<mock>: one or more
+# comma separated levels, each "COLUMN" or "COLUMN:expression". Examples:
+#   "BUSINESS_UNIT"                          -> first 5 characters of BUSINESS_UNIT (the original split)
+#   "BUSINESS_UNIT:prefix=3"                 -> first 3 characters
+#   "BUSINESS_UNIT, ACCOUNTING_DT:month"     -> BU, then calendar month of ACCOUNTING_DT
+#   "BUSINESS_UNIT:value, LEDGER:value"      -> full values
+PARTITION_KIND_PREFIX = "prefix"
+PARTITION_KIND_VALUE = "value"
+PARTITION_DATE_FORMATS = {"year": "%Y", "quarter": None, "month": "%Y-%m", "day": "%Y-%m-%d"}
+DEFAULT_PREFIX_LENGTH = 5
+
+# The first level keeps the existing "BU" label in keys, tags and the manifest.
+FIRST_LEVEL_LABEL = "BU"
+
+# Key value of rows without a value (or without a valid date) for a level. Also used in the BU tag,
+# so it may only contain characters S3 allows in tag values.
+MISSING_PARTITION_VALUE = "NA"
+
+
+def parse_partition_spec(spec):
+    """
+    Parses a partition spec into a list of levels.
+
+    :param spec: String such as "BUSINESS_UNIT, ACCOUNTING_DT:month".
+    :return: List of dicts with 'Column', 'Kind' (prefix, value, year, quarter, month or day), 'Length' and 'Label'.
+    """
+    levels = []
+    for position, part in enumerate(str(spec).split(",")):
+        part = part.strip()
+        if not part:
+            continue
+        column, _, expression = part.partition(":")
+        column = column.strip()
+        expression = expression.strip().lower()
+        kind, length = PARTITION_KIND_PREFIX, DEFAULT_PREFIX_LENGTH
+        if expression.startswith(PARTITION_KIND_PREFIX):
+            length = int(expression.partition("=")[2] or DEFAULT_PREFIX_LENGTH)
+        elif expression == PARTITION_KIND_VALUE or expression in PARTITION_DATE_FORMATS:
+            kind = expression
+        elif expression:
+            raise ValueError(f"Unknown partition expression '{expression}' for column '{column}'.")
+        label = FIRST_LEVEL_LABEL if position == 0 else column
+        levels.append({"Column": column, "Kind": kind, "Length": length, "Label": label})
+    return levels
+
+
+def compute_partition_keys(df, levels):
+    """
+    Returns one key Series per level, each computed with a single vectorized operation over the column.
+    Missing values become MISSING_PARTITION_VALUE.
+    """
+    keys = []
+    for level in levels:
+        column = df[level["Column"]]
+        if level["Kind"] == PARTITION_KIND_PREFIX:
+            key = column.str[:level["Length"]]
+        elif level["Kind"] == PARTITION_KIND_VALUE:
+            key = column
+        else:
+            dates = pd.to_datetime(column, errors="coerce")
+            if level["Kind"] == "quarter":
+                key = dates.dt.to_period("Q").astype("string")
+            else:
+                key = dates.dt.strftime(PARTITION_DATE_FORMATS[level["Kind"]])
+        keys.append(key.astype("string").fillna(MISSING_PARTITION_VALUE).rename(level["Label"]))
+    return keys
+
+
+def build_partition_output_key(output_folder, file_name, levels, values, extension):
+    """
+    Builds the S3 key for one partition. Every level but the last becomes a folder and every level is
+    appended to the file name, so a single level keeps the original "<file>_BU<value>" key.
+    Example for two levels: ".../1-Extracted/BU12345/data_file_BU12345_ACCOUNTING_DT2024-01.xlsx"
+    """
+    parts = [f"{level['Label']}{value}" for level, value in zip(levels, values)]
+    folders = "".join(f"{part}/" for part in parts[:-1])
+    return f"{output_folder}/{folders}{file_name}_{'_'.join(parts)}{extension}"
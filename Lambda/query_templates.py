@@ -0,0 +1,91 @@
+import re
+import time
+import threading
+from execute_tsql import execute_tsql, update_stmnt
+
+# Mock numbers name the setup tables (SETUP_CONVERSION_PLAN_<mock>, SETUP_FILE_COLUMN_NAMES_<mock>),
+# so they are the only part of a query that cannot be a parameter. They must look like a mock number
+# and the table must exist in the database.
+MOCK_NUMBER_PATTERN = re.compile(r"^MOCK\d+$", re.IGNORECASE)
+SETUP_TABLE_PREFIXES = {"plan_table": "SETUP_CONVERSION_PLAN_", "column_table": "SETUP_FILE_COLUMN_NAMES_"}
+# Seconds the list of existing setup tables is reused before it is read again.
+SETUP_TABLES_TTL_SECONDS = 900
+
+# Query templates. Table names are filled in from the allow-list; every value is a ? parameter, so the
+# statement text is the same for every file and SQL Server reuses one plan per template.
+QUERY_TEMPLATES = {
+    # One batch, three result sets: the version checksum, the plan rows and the column title rows.
+    "setup_snapshot": (
+        "SET NOCOUNT ON; "
+        "SELECT (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {plan_table}) AS PlanChecksum, "
+        "(SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {column_table}) AS ColumnChecksum; "
+        "SELECT * FROM {plan_table}; "
+        "SELECT table_name, columntitleline FROM {column_table};"
+    ),
+    "setup_tables_version": "SELECT (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {plan_table}), (SELECT CHECKSUM_AGG(BINARY_CHECKSUM(*)) FROM {column_table});",
+    "mark_file_not_expected": "UPDATE {plan_table} SET file_expected = 'No' WHERE table_name = ?;"
+}
+
+# Existing setup tables (upper case), shared by warm invocations.
+known_setup_tables = {"Tables": set(), "Loaded At": None}
+known_setup_tables_lock = threading.Lock()
+
+
+def load_known_setup_tables(refresh=False):
+    """Returns the names of the setup tables in the database, read at most once per SETUP_TABLES_TTL_SECONDS."""
+    with known_setup_tables_lock:
+        loaded_at = known_setup_tables["Loaded At"]
+        if refresh or loaded_at is None or time.monotonic() - loaded_at >= SETUP_TABLES_TTL_SECONDS:
+            result = execute_tsql(
+                "SELECT name FROM sys.tables WHERE name LIKE 'SETUP[_]CONVERSION[_]PLAN[_]%' OR name LIKE 'SETUP[_]FILE[_]COLUMN[_]NAMES[_]%';",
+                return_format='first_column'
+            )
+            if result is not None:
+                known_setup_tables["Tables"] = {name.upper() for name in result}
+                known_setup_tables["Loaded At"] = time.monotonic()
+        return known_setup_tables["Tables"]
+
+
+def resolve_setup_tables(mock_number):
+    """
+    Returns the setup table names of a mock number for the query templates.
+    Raises ValueError if the mock number is not a known mock; it is never copied into a query otherwise.
+    """
+    mock_number = str(mock_number or "").strip()
+    if not MOCK_NUMBER_PATTERN.match(mock_number):
+        raise ValueError(f"Invalid mock number: {mock_number!r}.")
+
+    tables = {name: f"{prefix}{mock_number.upper()}" for name, prefix in SETUP_TABLE_PREFIXES.items()}
+    known_tables = load_known_setup_tables()
+    if tables["plan_table"] not in known_tables:
+        # A new mock may have been set up since the list was read.
+        known_tables = load_known_setup_tables(refresh=True)
+        if tables["plan_table"] not in known_tables:
+            raise ValueError(f"Unknown mock number: {mock_number}. There is no {tables['plan_table']} table.")
+    return tables
+
+
+def build_query(template_name, mock_number):
+    """Returns the statement text of a template for a mock number."""
+    return QUERY_TEMPLATES[template_name].format(**resolve_setup_tables(mock_number))
+
+
+def run_query(template_name, mock_number, params=(), return_format='dict'):
+    """Runs a query template with its values as parameters; same return formats as execute_tsql."""
+    tsql_query = build_query(template_name, mock_number)
+    print(f"Running query template {template_name}: {tsql_query} with parameters {params}") #For troubleshooting.
+    return execute_tsql(tsql_query, return_format=return_format, params=params)
+
+
+def run_update(template_name, mock_number, params=()):
+    """
+    Runs an update template with its values as parameters; returns the affected row count or None.
+    Like update_stmnt, errors (including an unknown mock number) are logged and None is returned.
+    """
+    try:
+        tsql_query = build_query(template_name, mock_number)
+    except Exception as e:
+        print(f"An error occurred while building update template {template_name}: {e}")
+        return None
+    print(f"Running update template {template_name}: {tsql_query} with parameters {params}") #For troubleshooting.
+    return update_stmnt(tsql_query, params)
@@ -1,6 +1,8 @@
 import boto3
 from datetime import datetime, timezone
 from send_file_notification_email import send_file_notification_email
+from object_session import get_object_head, get_pending_tags, forget_object
+from add_tags_to_s3_object import build_tagging_header
 
 s3 = boto3.client("s3")
 
@@ -42,7 +44,7 @@ def relocate_file(bucket_name, file_key, tag_values, data_entity_folder):
         #timestamp = now.strftime("%m_%d_%Y %I_%M_%p").lower()
 
         # Get object metadata
-        response = s3.head_object(Bucket=bucket_name, Key=file_key)
+        response = get_object_head(bucket_name, file_key)
         
         # Extract last modified date
         last_modified = response['LastModified']
@@ -58,15 +60,22 @@ def relocate_file(bucket_name, file_key, tag_values, data_entity_folder):
         new_file_key = f"ConversionFiles/{mock_number}/{pillar}/{data_entity_folder}/{source}/{file_key.split('/')[-1]}"
 
     try:
+        # Tags buffered in the object session are set by the copy itself (instead of a separate
+        # tag write before or after it); otherwise the copy keeps the tags stored in S3.
+        pending_tags = get_pending_tags(bucket_name, file_key)
+        tagging = {"TaggingDirective": "REPLACE", "Tagging": build_tagging_header(pending_tags)} if pending_tags else {}
+
         # Copy the file to the new location
         s3.copy_object(
             Bucket=bucket_name,
             CopySource={"Bucket": bucket_name, "Key": file_key},
-            Key=new_file_key
+            Key=new_file_key,
+            **tagging
         )
 
         # Delete the original file
         s3.delete_object(Bucket=bucket_name, Key=file_key)
+        forget_object(bucket_name, file_key)
         print(f"File moved successfully to {new_file_key}") #For troubleshoting.
         return {
             "statusCode": 200,
@@ -111,15 +120,22 @@ def relocate_file_specified_new_key(bucket_name, old_file_key, new_file_key, tag
 
 
     try:
+        # Tags buffered in the object session are set by the copy itself (instead of a separate
+        # tag write before or after it); otherwise the copy keeps the tags stored in S3.
+        pending_tags = get_pending_tags(bucket_name, old_file_key)
+        tagging = {"TaggingDirective": "REPLACE", "Tagging": build_tagging_header(pending_tags)} if pending_tags else {}
+
         # Copy the file to the new location
         s3.copy_object(
             Bucket=bucket_name,
             CopySource={"Bucket": bucket_name, "Key": old_file_key},
-            Key=new_file_key
+            Key=new_file_key,
+            **tagging
         )
 
         # Delete the original file
         s3.delete_object(Bucket=bucket_name, Key=old_file_key)
+        forget_object(bucket_name, old_file_key)
         print(f"File moved successfully to {new_file_key}") #For troubleshoting.
         return {
             "statusCode": 200,
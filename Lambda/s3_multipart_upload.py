@@ -0,0 +1,147 @@
+import io
+import boto3
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from add_tags_to_s3_object import build_tagging_header
+
+# Initialize S3 client
+s3_client = boto3.client("s3")
+
+# S3 requires every part except the last to be at least 5 MiB.
+MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# Parts uploaded at the same time per writer. Memory use is about part size * (workers + 1).
+MULTIPART_UPLOAD_WORKERS = 4
+
+
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Write-only, non-seekable file object that uploads what is written to it as S3 multipart parts
+    while the content is still being produced.
+
+    Full parts are uploaded concurrently by a small thread pool; at most MULTIPART_UPLOAD_WORKERS
+    parts are in flight, so writers block instead of buffering the whole artifact.
+    Content smaller than one part is sent with a single put_object when the writer is closed.
+    If the writer is closed because of an exception (or a part fails) the multipart upload is aborted,
+    so no incomplete upload is left behind. Tags are sent with the request that creates the object.
+
+    Usage:
+        with S3MultipartWriter(bucket_name, key, content_type="text/csv") as writer:
+            df.to_csv(writer, index=False)
+    """
+
+    def __init__(self, bucket_name, object_key, content_type=None, tags=None, part_size=MULTIPART_PART_SIZE,
+                 max_workers=MULTIPART_UPLOAD_WORKERS, client=None):
+        super().__init__()
+        self.bucket_name = bucket_name
+        self.object_key = object_key
+        self.part_size = max(part_size, 5 * 1024 * 1024)
+        self.max_workers = max_workers
+        self.client = client or s3_client
+        self.extra_args = {"ContentType": content_type} if content_type else {}
+        if tags:
+            self.extra_args["Tagging"] = build_tagging_header(tags)
+        self.upload_id = None
+        self.parts = []
+        self.pending = set()
+        self.executor = None
+        self.buffer = bytearray()
+        self.position = 0
+        self.aborted = False
+        self.response = None
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        # zipfile (openpyxl) and pyarrow only need the current position, not seek().
+        return self.position
+
+    def write(self, data):
+        if self.closed:
+            raise ValueError("I/O operation on closed S3MultipartWriter.")
+        data = memoryview(data).cast("B")
+        self.buffer += data
+        self.position += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self._submit_part(part)
+        return len(data)
+
+    def _start_upload(self):
+        response = self.client.create_multipart_upload(Bucket=self.bucket_name, Key=self.object_key, **self.extra_args)
+        self.upload_id = response["UploadId"]
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        print(f"Started multipart upload of s3://{self.bucket_name}/{self.object_key}.") #For troubleshooting.
+
+    def _upload_part(self, part_number, body):
+        response = self.client.upload_part(Bucket=self.bucket_name, Key=self.object_key, UploadId=self.upload_id,
+                                           PartNumber=part_number, Body=body)
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def _collect(self, futures):
+        for future in futures:
+            self.pending.discard(future)
+            self.parts.append(future.result())  # Raises the part's error.
+
+    def _submit_part(self, body):
+        if self.upload_id is None:
+            self._start_upload()
+        # Wait for a free slot so no more than max_workers parts are held in memory.
+        if len(self.pending) >= self.max_workers:
+            done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+            self._collect(done)
+        part_number = len(self.parts) + len(self.pending) + 1
+        self.pending.add(self.executor.submit(self._upload_part, part_number, body))
+
+    def abort(self):
+        """Cancels the upload and discards any parts already sent."""
+        if self.aborted:
+            return
+        self.aborted = True
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.upload_id is not None:
+            try:
+                self.client.abort_multipart_upload(Bucket=self.bucket_name, Key=self.object_key, UploadId=self.upload_id)
+                print(f"Aborted multipart upload of s3://{self.bucket_name}/{self.object_key}.")
+            except Exception as e:
+                print(f"Failed to abort multipart upload of s3://{self.bucket_name}/{self.object_key}: {e}")
+        self.buffer = bytearray()
+        super().close()
+
+    def close(self):
+        """Uploads the remaining content and completes the upload. Aborts it if anything fails."""
+        if self.closed:
+            return
+        try:
+            if self.upload_id is None:
+                # Everything fit in one part: a single request is cheaper than a multipart upload.
+                self.response = self.client.put_object(Bucket=self.bucket_name, Key=self.object_key,
+                                                       Body=bytes(self.buffer), **self.extra_args)
+            else:
+                if self.buffer:
+                    self._submit_part(bytes(self.buffer))
+                self._collect(list(self.pending))
+                self.executor.shutdown(wait=True)
+                self.response = self.client.complete_multipart_upload(
+                    Bucket=self.bucket_name, Key=self.object_key, UploadId=self.upload_id,
+                    MultipartUpload={"Parts": sorted(self.parts, key=lambda part: part["PartNumber"])}
+                )
+                print(f"Completed multipart upload of s3://{self.bucket_name}/{self.object_key} in {len(self.parts)} parts.") #For troubleshooting.
+        except Exception:
+            self.abort()
+            raise
+        self.buffer = bytearray()
+        super().close()
+
+    def __del__(self):
+        # A writer dropped without close() must not publish partial content.
+        if not self.closed:
+            self.abort()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+        return False
@@ -1,6 +1,7 @@
 import boto3
 import json
-from add_tags_to_s3_object import add_tags_to_s3_object
+from add_tags_to_s3_object import build_tagging_header
+from s3_multipart_upload import S3MultipartWriter
 
 # Initialize S3 client
 s3 = boto3.client("s3")
@@ -8,11 +9,16 @@ s3 = boto3.client("s3")
 def s3_upload(bucket_name, output_file_key, file_content, tags=None):
     print("Entered s3_upload.")
     try:
+        #Tags are set in the same request so the file never exists without them.
+        print(f"In s3_upload and the tags to add are the following: {tags}")
+        tagging = {"Tagging": build_tagging_header(tags)} if tags else {}
+
         # Upload the file to S3
         response = s3.put_object(
             Bucket=bucket_name,
             Key=output_file_key,
-            Body=file_content
+            Body=file_content,
+            **tagging
         )
 
         # Extract file name from the key
@@ -24,17 +30,39 @@ def s3_upload(bucket_name, output_file_key, file_content, tags=None):
         direct_file_url = f"{app_url}?prefix={file_path}&file={file_name}"
         print(f"direct_file_url: {direct_file_url}") #For troubleshooting.
 
-        #add tags to file
-        print(f"In s3_upload and the tags to add are the following: {tags}")
-        add_tags_to_s3_object(bucket_name, output_file_key, tags)
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'body': json.dumps(f'Error uploading file: {str(e)}')
+        }
+    
+    return {
+        'statusCode': 200,
+        'body': json.dumps('File uploaded successfully!')
+    }
+
 
+def s3_upload_stream(bucket_name, output_file_key, write_content, tags=None, content_type=None):
+    """
+    Uploads content while it is being generated instead of building it in memory first.
+
+    :param write_content: Function called with a writable binary file object, e.g. lambda f: df.to_csv(f).
+                          Parts are sent to S3 as they fill up; if it raises, the upload is aborted.
+    :param tags: Tags set when the upload is created, so the file is never visible without them.
+    :param content_type: Optional Content-Type stored with the file.
+    """
+    print("Entered s3_upload_stream.")
+    try:
+        print(f"In s3_upload_stream and the tags to add are the following: {tags}")
+        with S3MultipartWriter(bucket_name, output_file_key, content_type=content_type, tags=tags) as writer:
+            write_content(writer)
 
     except Exception as e:
         return {
             'statusCode': 500,
             'body': json.dumps(f'Error uploading file: {str(e)}')
         }
-    
+
     return {
         'statusCode': 200,
         'body': json.dumps('File uploaded successfully!')
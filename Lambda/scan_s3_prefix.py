@@ -0,0 +1,133 @@
+import queue
+import threading
+import boto3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+s3_client = boto3.client("s3")
+
+# Sub-prefixes listed at the same time.
+SCAN_LIST_WORKERS = 8
+# get_object_tagging requests in flight at the same time.
+SCAN_TAG_WORKERS = 16
+# Listing pages (up to 1000 keys each) buffered between the listing threads and the caller.
+SCAN_QUEUE_PAGES = 8
+
+_LISTING_DONE = object()
+
+
+def list_prefix_level(client, bucket_name, prefix):
+    """Lists one folder level of a prefix: returns (objects directly under it, its sub-prefixes)."""
+    objects, sub_prefixes = [], []
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter="/"):
+        objects.extend(page.get('Contents', []))
+        sub_prefixes.extend(common_prefix['Prefix'] for common_prefix in page.get('CommonPrefixes', []))
+    return objects, sub_prefixes
+
+
+def split_prefix(client, bucket_name, prefix, depth, executor):
+    """
+    Splits a prefix into the sub-prefixes depth folder levels below it,
+    e.g. ConversionFiles/ with depth 2 -> ConversionFiles/<Mock>/<Pillar>/.
+
+    :return: Tuple (objects found above that depth, sub-prefixes).
+    """
+    objects, level = [], [prefix]
+    for _ in range(depth):
+        next_level = []
+        for level_objects, sub_prefixes in executor.map(lambda p: list_prefix_level(client, bucket_name, p), level):
+            objects.extend(level_objects)
+            next_level.extend(sub_prefixes)
+        if not next_level:
+            # Everything under the prefix was already listed.
+            return objects, []
+        level = next_level
+    return objects, level
+
+
+def scan_s3_prefix(bucket_name, prefix, depth=0, with_tags=True, list_workers=SCAN_LIST_WORKERS,
+                   tag_workers=SCAN_TAG_WORKERS, client=None):
+    """
+    Walks every page of an S3 prefix and yields its objects with their tags.
+
+    The prefix is split depth folder levels down and the resulting sub-prefixes are listed in parallel.
+    Tags are fetched through a bounded worker pool while listing continues. The generator can be
+    abandoned early (e.g. after the first match); the listing threads then stop.
+
+    :param depth: Folder levels to split the prefix into before listing, 0 to list it as one.
+    :param with_tags: False to skip get_object_tagging (tags are then None).
+    :return: Generator of (key, size, etag, last_modified, tags) tuples. Order follows the listing of each sub-prefix.
+    """
+    client = client or s3_client
+    stop = threading.Event()
+    pages = queue.Queue(maxsize=SCAN_QUEUE_PAGES)
+    list_executor = ThreadPoolExecutor(max_workers=list_workers)
+    tag_executor = ThreadPoolExecutor(max_workers=tag_workers) if with_tags else None
+
+    def put(item):
+        # Blocks while the caller is behind, but gives up once the scan is stopped.
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def list_sub_prefix(sub_prefix):
+        try:
+            paginator = client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=sub_prefix):
+                if stop.is_set():
+                    return
+                put(page.get('Contents', []))
+        except Exception as e:
+            put(e)
+        finally:
+            put(_LISTING_DONE)
+
+    def get_tags(file_key):
+        tagging_response = client.get_object_tagging(Bucket=bucket_name, Key=file_key)
+        return {tag['Key']: tag['Value'] for tag in tagging_response.get('TagSet', [])}
+
+    def record(obj, tags):
+        return obj['Key'], obj.get('Size'), obj.get('ETag'), obj.get('LastModified'), tags
+
+    pending = deque()
+
+    def submit(obj):
+        pending.append((obj, tag_executor.submit(get_tags, obj['Key']) if with_tags else None))
+
+    try:
+        objects, sub_prefixes = split_prefix(client, bucket_name, prefix, depth, list_executor)
+        print(f"In scan_s3_prefix listing {len(sub_prefixes)} prefixes under {prefix}.") #For troubleshooting.
+        for sub_prefix in sub_prefixes:
+            list_executor.submit(list_sub_prefix, sub_prefix)
+
+        # Objects found while splitting sit above the listed sub-prefixes.
+        ready_pages = [objects]
+        running = len(sub_prefixes)
+        while ready_pages or running:
+            if ready_pages:
+                page = ready_pages.pop()
+            else:
+                page = pages.get()
+                if page is _LISTING_DONE:
+                    running -= 1
+                    continue
+                if isinstance(page, Exception):
+                    raise page
+            for obj in page:
+                submit(obj)
+                # Keep at most tag_workers * 2 objects waiting for tags.
+                while len(pending) > tag_workers * 2:
+                    obj_done, future = pending.popleft()
+                    yield record(obj_done, future.result() if future else None)
+        while pending:
+            obj_done, future = pending.popleft()
+            yield record(obj_done, future.result() if future else None)
+    finally:
+        stop.set()
+        list_executor.shutdown(wait=False, cancel_futures=True)
+        if tag_executor:
+            tag_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,41 @@
+import os
+import time
+import threading
+from get_aws_secret import get_aws_secret
+
+# Secret holding the ODBC connection string of the conversion database.
+DB_CONNECTION_SECRET = os.environ.get("DB_CONNECTION_SECRET", "Hacienda_ERP_Test_MSSQL_text")
+# Seconds a secret is used before it is read from Secrets Manager again.
+SECRET_TTL_SECONDS = float(os.environ.get("SECRET_TTL_SECONDS", "3600"))
+
+# Module level so warm invocations reuse resolved secrets: secret name -> (value, resolved_at).
+secret_cache = {}
+secret_lock = threading.Lock()
+
+
+def get_secret(secret_name, refresh=False):
+    """
+    Returns a secret, reading it from Secrets Manager on first use, after SECRET_TTL_SECONDS,
+    or when refresh is True (e.g. after a login failure caused by rotation).
+    """
+    with secret_lock:
+        cached = secret_cache.get(secret_name)
+        if cached and not refresh and time.monotonic() - cached[1] < SECRET_TTL_SECONDS:
+            return cached[0]
+
+        value = get_aws_secret(secret_name)
+        secret_cache[secret_name] = (value, time.monotonic())
+        print(f"Resolved secret {secret_name}.") #For troubleshooting.
+        return value
+
+
+def invalidate_secret(secret_name):
+    """Forgets a cached secret so the next get_secret reads it again. Returns the forgotten value, if any."""
+    with secret_lock:
+        cached = secret_cache.pop(secret_name, None)
+    return cached[0] if cached else None
+
+
+def get_database_connection_string():
+    """Returns the conversion database connection string (resolved lazily and cached)."""
+    return get_secret(DB_CONNECTION_SECRET)
@@ -0,0 +1,141 @@
+import os
+import time
+import threading
+from query_templates import run_query
+
+# Seconds a snapshot of a mock's setup tables is used before it is reloaded.
+SETUP_CACHE_TTL_SECONDS = float(os.environ.get("SETUP_CACHE_TTL_SECONDS", "900"))
+# A snapshot last checked more than this many seconds ago is compared with a checksum of the tables
+# before use, so changes made by other containers (e.g. file_expected set to 'No') are picked up.
+# The window is time based: a long invocation checks again each time it has passed, and lookups
+# from separate invocations inside the window share one check.
+SETUP_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get("SETUP_CACHE_VERSION_CHECK_SECONDS", "5"))
+
+# Module level so warm invocations reuse them: mock number -> snapshot (see load_setup_snapshot).
+setup_snapshots = {}
+setup_lock = threading.Lock()
+
+
+def normalize_lookup_value(value):
+    """SQL Server compares these columns case-insensitively and ignores trailing spaces; so do the indexes."""
+    return str(value).rstrip().upper() if value is not None else None
+
+
+def normalize_mock_number(mock_number):
+    """Snapshot key of a mock number; query_templates upper cases it too, so "Mock8" and "MOCK8" share one snapshot."""
+    return str(mock_number).strip().upper()
+
+
+def get_row_value(row, column_name):
+    """Returns a column of a setup row regardless of the column name's case."""
+    for key, value in row.items():
+        if key.lower() == column_name.lower():
+            return value
+    return None
+
+
+def get_setup_tables_version(mock_number):
+    """Returns a checksum of both setup tables of a mock; it changes when any row changes."""
+    result = run_query("setup_tables_version", mock_number, return_format='tuple')
+    return tuple(result[0]) if result else None
+
+
+def load_setup_snapshot(mock_number):
+    """
+    Reads SETUP_CONVERSION_PLAN_<mock> and SETUP_FILE_COLUMN_NAMES_<mock> and indexes them.
+    Both tables and their version checksum come back from one batch, in a single round trip.
+
+    :return: Snapshot dictionary, or None if the tables could not be read.
+    Raises ValueError for a mock number that is not a known mock (see query_templates).
+    """
+    result_sets = run_query("setup_snapshot", mock_number, return_format='result_sets')
+    if not result_sets or len(result_sets) != 3:
+        return None
+    version_rows, plan_rows, column_rows = result_sets
+    # Same value as get_setup_tables_version.
+    version = (version_rows[0]["PlanChecksum"], version_rows[0]["ColumnChecksum"]) if version_rows else None
+
+    snapshot = {
+        "Version": version,
+        "Loaded At": time.monotonic(),
+        "Checked At": time.monotonic(),
+        "By Filename": {},
+        "By Table Name": {},
+        "Column Titles": {}
+    }
+    for row in plan_rows:
+        # Like SELECT TOP 1 / result[0]: the first row read for a value wins.
+        snapshot["By Filename"].setdefault(normalize_lookup_value(get_row_value(row, "filename")), row)
+        snapshot["By Table Name"].setdefault(normalize_lookup_value(get_row_value(row, "table_name")), []).append(row)
+    for row in column_rows:
+        # Same split as CROSS APPLY STRING_SPLIT(columntitleline, ',').
+        titles = get_row_value(row, "columntitleline")
+        if titles is not None:
+            table_titles = snapshot["Column Titles"].setdefault(normalize_lookup_value(get_row_value(row, "table_name")), [])
+            table_titles.extend(titles.split(','))
+
+    print(f"Loaded setup metadata for {mock_number}: {len(plan_rows)} plan rows, {len(column_rows)} column title rows.") #For troubleshooting.
+    return snapshot
+
+
+def get_setup_snapshot(mock_number):
+    """Returns the cached snapshot of a mock's setup tables, reloading it after the TTL or when the tables changed."""
+    mock_number = normalize_mock_number(mock_number)
+    with setup_lock:
+        snapshot = setup_snapshots.get(mock_number)
+        now = time.monotonic()
+        if snapshot and now - snapshot["Loaded At"] < SETUP_CACHE_TTL_SECONDS:
+            if now - snapshot["Checked At"] < SETUP_CACHE_VERSION_CHECK_SECONDS:
+                return snapshot
+            if get_setup_tables_version(mock_number) == snapshot["Version"]:
+                snapshot["Checked At"] = now
+                return snapshot
+            print(f"Setup metadata for {mock_number} changed; reloading.") #For troubleshooting.
+
+        snapshot = load_setup_snapshot(mock_number)
+        if snapshot is None:
+            setup_snapshots.pop(mock_number, None)
+        else:
+            setup_snapshots[mock_number] = snapshot
+        return snapshot
+
+
+def invalidate_setup_metadata(mock_number=None):
+    """Drops the snapshot of one mock (or all of them), e.g. after updating SETUP_CONVERSION_PLAN."""
+    with setup_lock:
+        if mock_number is None:
+            setup_snapshots.clear()
+        else:
+            setup_snapshots.pop(normalize_mock_number(mock_number), None)
+
+
+def find_plan_row_by_filename(mock_number, file_name):
+    """SETUP_CONVERSION_PLAN row WHERE filename = file_name, or None. Returns a copy."""
+    snapshot = get_setup_snapshot(mock_number)
+    if snapshot is None:
+        return None
+    row = snapshot["By Filename"].get(normalize_lookup_value(file_name))
+    return dict(row) if row else None
+
+
+def find_plan_row_by_table_name(mock_number, table_name, loadable_only=False):
+    """
+    SETUP_CONVERSION_PLAN row WHERE table_name = table_name, or None. Returns a copy.
+
+    :param loadable_only: Only rows with an EntityOnFileStructure (the TSQL load file lookup).
+    """
+    snapshot = get_setup_snapshot(mock_number)
+    if snapshot is None:
+        return None
+    for row in snapshot["By Table Name"].get(normalize_lookup_value(table_name), []):
+        if not loadable_only or get_row_value(row, "EntityOnFileStructure") is not None:
+            return dict(row)
+    return None
+
+
+def get_column_titles(mock_number, table_name):
+    """Expected column headers of a table from SETUP_FILE_COLUMN_NAMES_<mock>, or None if the tables could not be read."""
+    snapshot = get_setup_snapshot(mock_number)
+    if snapshot is None:
+        return None
+    return list(snapshot["Column Titles"].get(normalize_lookup_value(table_name), []))
@@ -0,0 +1,55 @@
+import os
+from xlsx_writer import write_frame_to_xlsx
+from csv_frame import PARQUET_AVAILABLE
+
+# Output formats for the split (and "All") files written to DataValidation.
+OUTPUT_FORMAT_XLSX = "xlsx"        # For business users who open the files in Excel.
+OUTPUT_FORMAT_CSV_GZIP = "csv.gz"  # Smallest and fastest to write; read by downstream tools.
+OUTPUT_FORMAT_PARQUET = "parquet"  # Columnar; needs pyarrow.
+
+OUTPUT_FORMATS = {
+    OUTPUT_FORMAT_XLSX: {"Extension": ".xlsx", "ContentType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    OUTPUT_FORMAT_CSV_GZIP: {"Extension": ".csv.gz", "ContentType": "application/gzip"},
+    OUTPUT_FORMAT_PARQUET: {"Extension": ".parquet", "ContentType": "application/vnd.apache.parquet"}
+}
+
+# Accepted spellings in the setup table.
+OUTPUT_FORMAT_ALIASES = {
+    "xlsx": OUTPUT_FORMAT_XLSX, "excel": OUTPUT_FORMAT_XLSX,
+    "csv": OUTPUT_FORMAT_CSV_GZIP, "csv.gz": OUTPUT_FORMAT_CSV_GZIP, "gzip": OUTPUT_FORMAT_CSV_GZIP,
+    "parquet": OUTPUT_FORMAT_PARQUET
+}
+
+# Used when the setup table does not set a format for the entity.
+DEFAULT_SPLIT_OUTPUT_FORMAT = os.environ.get("SPLIT_OUTPUT_FORMAT", OUTPUT_FORMAT_XLSX)
+
+
+def normalize_output_format(value):
+    """Maps a format name from the setup table to one of OUTPUT_FORMATS, falling back to the default."""
+    output_format = OUTPUT_FORMAT_ALIASES.get(str(value or "").strip().lower().lstrip("."))
+    if output_format is None:
+        output_format = OUTPUT_FORMAT_ALIASES.get(DEFAULT_SPLIT_OUTPUT_FORMAT.strip().lower(), OUTPUT_FORMAT_XLSX)
+    if output_format == OUTPUT_FORMAT_PARQUET and not PARQUET_AVAILABLE:
+        print("pyarrow is not available; writing csv.gz instead of parquet.")
+        output_format = OUTPUT_FORMAT_CSV_GZIP
+    return output_format
+
+
+def get_output_extension(output_format):
+    """Returns the file extension (with the leading dot) for an output format."""
+    return OUTPUT_FORMATS[output_format]["Extension"]
+
+
+def get_output_content_type(output_format):
+    """Returns the Content-Type to store with files of an output format."""
+    return OUTPUT_FORMATS[output_format]["ContentType"]
+
+
+def write_frame(df, output, output_format):
+    """Writes a DataFrame (header row plus values, no index) to a binary file-like object in the given format."""
+    if output_format == OUTPUT_FORMAT_CSV_GZIP:
+        df.to_csv(output, index=False, compression="gzip")
+    elif output_format == OUTPUT_FORMAT_PARQUET:
+        df.to_parquet(output, index=False)
+    else:
+        write_frame_to_xlsx(df, output)
@@ -0,0 +1,109 @@
+import re
+import uuid
+import hashlib
+from db_connection_pool import get_connection, release_connection
+from bulk_insert import bulk_insert
+from parse_tsql_statement import parse_insert_statement
+
+# Table hint for the staging insert and the switch-in. TABLOCK lets SQL Server minimally log
+# inserts into a heap (and into the target when it is a heap or empty, under simple or bulk-logged recovery).
+STAGING_TABLE_HINT = "WITH (TABLOCK)"
+
+
+def build_staging_table_name(target_table, prefix="#"):
+    """
+    Builds a unique temp table name for staging a load into target_table.
+    Use prefix '#' for a session-scoped table or '##' for a global one shared across connections.
+    """
+    base_name = re.sub(r"[^0-9A-Za-z_]", "", target_table.split('.')[-1])[:60]
+    return f"{prefix}{base_name}_STAGE_{uuid.uuid4().hex[:12]}"
+
+
+def build_load_staging_table_name(csv_bucket_name, csv_file_key, etag):
+    """
+    Builds the name of the permanent staging table for a streamed load of one version of a file.
+    The same file and ETag always get the same table, so a continuation finds the rows staged before it.
+    """
+    load_hash = hashlib.sha1(f"{csv_bucket_name}/{csv_file_key}|{etag}".encode("utf-8")).hexdigest()[:20]
+    return f"LOAD_STAGE_{load_hash}"
+
+
+def build_staging_insert_statement(statement_info, staging_table, table_hint=""):
+    """Returns the TSQL load statement retargeted at the staging table."""
+    columns = ", ".join(statement_info["columns"])
+    return f"INSERT INTO {staging_table} {table_hint} ({columns}) VALUES ({statement_info['values_clause']})"
+
+
+def create_staging_table(cursor, statement_info, staging_table):
+    """Creates an empty heap with the target table's column types for the columns in the load statement."""
+    columns = ", ".join(statement_info["columns"])
+    tsql_query = f"SELECT TOP 0 {columns} INTO {staging_table} FROM {statement_info['table']};"
+    print(f"In create_staging_table running: {tsql_query}") #For troubleshooting.
+    cursor.execute(tsql_query)
+
+
+def switch_in_staging_table(cursor, statement_info, staging_table, table_hint=""):
+    """
+    Moves every staged row into the target table with one set-based INSERT ... SELECT.
+    Does not commit; the caller owns the transaction.
+    """
+    columns = ", ".join(statement_info["columns"])
+    tsql_query = f"INSERT INTO {statement_info['table']} {table_hint} ({columns}) SELECT {columns} FROM {staging_table};"
+    print(f"In switch_in_staging_table running: {tsql_query}") #For troubleshooting.
+    cursor.execute(tsql_query)
+    return cursor.rowcount
+
+
+def drop_staging_table(cursor, staging_table):
+    """Drops the staging table (temp or permanent) if it still exists."""
+    object_name = f"tempdb..{staging_table}" if staging_table.startswith("#") else staging_table
+    cursor.execute(f"IF OBJECT_ID('{object_name}') IS NOT NULL DROP TABLE {staging_table};")
+
+
+def staged_insert_rows(connection_str, tsql_statement, rows, statement_info=None):
+    """
+    Inserts rows through a session-scoped heap staging table (#) and switches them into the target.
+
+    The rows are bulk inserted into the staging table with TABLOCK and committed, then moved into
+    the target with one INSERT ... WITH (TABLOCK) SELECT in its own short transaction. A failure
+    before the switch-in leaves the target table untouched.
+
+    :param statement_info: parse_insert_statement result for tsql_statement, when the caller already has it.
+    :return: Number of rows moved into the target table.
+    """
+    if statement_info is None:
+        statement_info = parse_insert_statement(tsql_statement)
+    if not statement_info:
+        raise ValueError("The TSQL load statement must be a single INSERT ... VALUES statement for a staged load.")
+
+    staging_table = build_staging_table_name(statement_info["table"], prefix="#")
+    staging_insert_statement = build_staging_insert_statement(statement_info, staging_table, STAGING_TABLE_HINT)
+    print(f"In staged_insert_rows loading {len(rows)} rows through {staging_table}.") #For troubleshooting.
+
+    cnxn = get_connection(connection_str)
+    cursor = cnxn.cursor()
+    broken = False
+    try:
+        create_staging_table(cursor, statement_info, staging_table)
+        bulk_insert(cnxn, staging_insert_statement, rows)
+        cnxn.commit()
+
+        # The only transaction that touches the target table.
+        moved_rows = switch_in_staging_table(cursor, statement_info, staging_table, STAGING_TABLE_HINT)
+        cnxn.commit()
+        print(f"In staged_insert_rows moved {moved_rows} rows into {statement_info['table']}.") #For troubleshooting.
+        return moved_rows
+    except Exception:
+        broken = True
+        cnxn.rollback()
+        raise
+    finally:
+        try:
+            drop_staging_table(cursor, staging_table)
+            cnxn.commit()
+        except Exception as e:
+            # The session still holds the temp table, so the connection must not be reused.
+            broken = True
+            print(f"Error dropping staging table {staging_table}: {e}")
+        cursor.close()
+        release_connection(connection_str, cnxn, broken)
@@ -0,0 +1,77 @@
+import io
+import pandas as pd
+
+# Size of each read from the S3 StreamingBody.
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Number of CSV records handed to the database per batch.
+STREAM_BATCH_SIZE = 50000
+
+
+def iter_csv_record_batches(body, batch_size=STREAM_BATCH_SIZE, chunk_size=STREAM_CHUNK_SIZE, header=None, start_offset=0):
+    """
+    Reads a CSV byte stream in bounded chunks and yields it back in whole-record batches.
+
+    A record ends at a newline that is not inside a quoted field, so quoted values with
+    embedded line breaks stay in one record. Quotes and newlines are single bytes in UTF-8,
+    so the scan works on raw bytes and every batch can be decoded on its own.
+
+    :param body: botocore StreamingBody (anything with iter_chunks) positioned at start_offset.
+    :param batch_size: Number of records per batch.
+    :param chunk_size: Number of bytes read from the stream at a time.
+    :param header: Header line bytes. When None the first record of the stream is used as the header.
+    :param start_offset: Absolute byte offset of the first byte in the stream.
+    :return: Generator of (header_bytes, batch_bytes, end_offset) where end_offset is the absolute
+             byte offset just after the batch.
+    """
+    # Bytes are appended in place; only the part before a yielded batch is ever copied out.
+    buffer = bytearray()
+    buffer_offset = start_offset  # Absolute offset of buffer[0].
+    scan_pos = 0
+    record_count = 0
+    in_quotes = False
+
+    for chunk in body.iter_chunks(chunk_size):
+        buffer += chunk
+        while True:
+            newline_pos = buffer.find(b"\n", scan_pos)
+            if newline_pos == -1:
+                break
+            if buffer.count(b'"', scan_pos, newline_pos) % 2:
+                in_quotes = not in_quotes
+            scan_pos = newline_pos + 1
+            if in_quotes:
+                continue
+
+            if header is None:
+                header = bytes(buffer[:scan_pos])
+                del buffer[:scan_pos]
+                buffer_offset += scan_pos
+                scan_pos = 0
+                continue
+
+            record_count += 1
+            if record_count == batch_size:
+                yield header, bytes(buffer[:scan_pos]), buffer_offset + scan_pos
+                del buffer[:scan_pos]
+                buffer_offset += scan_pos
+                scan_pos = 0
+                record_count = 0
+
+    # Whatever is left is the last (possibly unterminated) batch.
+    if header is None:
+        header = bytes(buffer)
+        buffer = bytearray()
+    if buffer.strip():
+        yield header, bytes(buffer), buffer_offset + len(buffer)
+
+
+def parse_csv_batch(header, batch):
+    """
+    Parses one batch of CSV records into a list of rows with every value as a string.
+    Uses the same decoding and NaN handling as the in-memory load path.
+    """
+    text = (header + batch).decode('utf-8', errors="ignore")
+    data = pd.read_csv(io.StringIO(text), dtype="string")
+    data = data.fillna("")
+    return data.values.tolist()
@@ -0,0 +1,134 @@
+import json
+import boto3
+from botocore.exceptions import ClientError
+from add_tags_to_s3_object import stringify_values
+
+s3_client = boto3.client("s3")
+
+# Index of TSQL load files: (Pillar, Data Entity, Mock Number, Source) -> TSQLFiles/ key.
+# Kept outside TSQLFiles/ so writing it does not look like a new TSQL file to lambda_handler.
+TSQL_INDEX_KEY = "TSQLIndex/tsql_index.json"
+TSQL_INDEX_TAGS = ["Pillar", "Data Entity", "Mock Number", "Source"]
+# Only load files are indexed; Validation, Recon and Conversion files share the other tags with them.
+TSQL_LOAD_CATEGORY = "Load"
+# Attempts of the read-modify-write cycle when another invocation updates the index at the same time.
+TSQL_INDEX_UPDATE_ATTEMPTS = 5
+# Event that rebuilds the index from the tags of every TSQL file: {"Command": "RebuildTSQLIndex", "Bucket": "..."}
+REBUILD_TSQL_INDEX_COMMAND = "RebuildTSQLIndex"
+
+
+def is_tsql_load_file(tags):
+    """True if the tags of a TSQL file mark it as a load file (files tagged before the Category tag count as load files)."""
+    return stringify_values(tags).get("Category", TSQL_LOAD_CATEGORY) == TSQL_LOAD_CATEGORY
+
+
+def get_tsql_index_entry(tags):
+    """Returns the index entry name for a set of tags, or None when one of the index tags is missing."""
+    tags = stringify_values(tags)
+    values = [tags.get(tag) for tag in TSQL_INDEX_TAGS]
+    if any(value is None for value in values):
+        return None
+    return "|".join(values)
+
+
+def read_tsql_index(bucket_name):
+    """
+    Reads the index.
+
+    :return: Tuple (entries, etag). entries is an empty dictionary and etag None when there is no index yet.
+    """
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=TSQL_INDEX_KEY)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ("NoSuchKey", "404"):
+            return {}, None
+        raise
+    index = json.loads(response['Body'].read())
+    return index.get("Entries", {}), response['ETag']
+
+
+def write_tsql_index(bucket_name, entries, etag=None, conditional=True):
+    """
+    Writes the index. With conditional=True the write only succeeds if the index is still the version
+    that was read (etag), or still does not exist when etag is None.
+    """
+    condition = {}
+    if conditional:
+        condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    s3_client.put_object(
+        Bucket=bucket_name,
+        Key=TSQL_INDEX_KEY,
+        Body=json.dumps({"Entries": entries}, indent=2).encode("utf-8"),
+        ContentType="application/json",
+        **condition
+    )
+
+
+def modify_tsql_index(bucket_name, file_key, entry=None):
+    """
+    Removes the entries pointing to file_key and, when entry is given, points entry to file_key.
+    Concurrent updates are detected with a conditional write and retried on the new version of the index.
+    """
+    for attempt in range(1, TSQL_INDEX_UPDATE_ATTEMPTS + 1):
+        entries, etag = read_tsql_index(bucket_name)
+        entries = {name: key for name, key in entries.items() if key != file_key}
+        if entry is not None:
+            entries[entry] = file_key
+        try:
+            write_tsql_index(bucket_name, entries, etag)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ("PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                raise
+            print(f"In modify_tsql_index the index changed during attempt {attempt}; retrying.") #For troubleshooting.
+    print(f"In modify_tsql_index could not update the index for {file_key} after {TSQL_INDEX_UPDATE_ATTEMPTS} attempts.")
+    return False
+
+
+def update_tsql_index(bucket_name, file_key, tags):
+    """Points the index entry for the load file's tags to file_key (and removes older entries for the same key)."""
+    if not is_tsql_load_file(tags):
+        print(f"In update_tsql_index {file_key} is not a {TSQL_LOAD_CATEGORY} file; index not updated.") #For troubleshooting.
+        return False
+    entry = get_tsql_index_entry(tags)
+    if entry is None:
+        print(f"In update_tsql_index {file_key} is missing one of the tags {TSQL_INDEX_TAGS}; index not updated.")
+        return False
+
+    updated = modify_tsql_index(bucket_name, file_key, entry)
+    if updated:
+        print(f"In update_tsql_index {entry} now points to {file_key}.") #For troubleshooting.
+    return updated
+
+
+def remove_tsql_index_key(bucket_name, file_key):
+    """Removes the entries pointing to a TSQL file that no longer exists."""
+    removed = modify_tsql_index(bucket_name, file_key)
+    if removed:
+        print(f"In remove_tsql_index_key removed the entries for {file_key}.") #For troubleshooting.
+    return removed
+
+
+def find_tsql_index_entry(bucket_name, tags):
+    """Returns the TSQL file key indexed for the tags, or None when there is no entry."""
+    entry = get_tsql_index_entry(tags)
+    if entry is None:
+        return None
+    entries, _ = read_tsql_index(bucket_name)
+    return entries.get(entry)
+
+
+def rebuild_tsql_index(bucket_name, tagged_files):
+    """
+    Replaces the index with one built from (file_key, tags, last_modified) tuples, e.g. a scan of TSQLFiles/.
+    Only load files are indexed. When two load files have the same tags the most recently modified one wins.
+    """
+    entries, entry_modified = {}, {}
+    for file_key, tags, last_modified in tagged_files:
+        entry = get_tsql_index_entry(tags) if is_tsql_load_file(tags) else None
+        if entry is not None and (entry not in entries or last_modified > entry_modified[entry]):
+            entries[entry] = file_key
+            entry_modified[entry] = last_modified
+    write_tsql_index(bucket_name, entries, conditional=False)
+    print(f"Rebuilt TSQL index with {len(entries)} entries.")
+    return entries
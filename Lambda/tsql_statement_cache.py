@@ -0,0 +1,47 @@
+import boto3
+from botocore.exceptions import ClientError
+from parse_tsql_statement import parse_insert_statement, count_placeholders
+
+s3_client = boto3.client("s3")
+
+# TSQL load statements kept by a warm container: (bucket, key) -> {"ETag", "Statement", "Statement Info", "Expected Params"}.
+tsql_statement_cache = {}
+
+
+def analyze_tsql_statement(tsql_statement, etag):
+    """Builds a cache entry: the statement text, its parsed target table and columns, and its placeholder count."""
+    return {
+        "ETag": etag,
+        "Statement": tsql_statement,
+        "Statement Info": parse_insert_statement(tsql_statement),
+        "Expected Params": count_placeholders(tsql_statement)
+    }
+
+
+def get_tsql_statement(bucket_name, file_key):
+    """
+    Returns the TSQL load statement of a file and its analysis, downloading and parsing it only when it changed.
+
+    A cached statement is validated with a conditional GET (If-None-Match on its ETag); S3 answers
+    304 Not Modified without a body when the file is unchanged.
+
+    :return: Dictionary with 'ETag', 'Statement', 'Statement Info' (see parse_insert_statement) and 'Expected Params'.
+    """
+    cache_key = (bucket_name, file_key)
+    cached = tsql_statement_cache.get(cache_key)
+    try:
+        if cached:
+            response = s3_client.get_object(Bucket=bucket_name, Key=file_key, IfNoneMatch=cached["ETag"])
+        else:
+            response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
+    except ClientError as e:
+        if cached and e.response['Error']['Code'] in ("304", "NotModified"):
+            print(f"In get_tsql_statement {file_key} is unchanged; using the cached statement.") #For troubleshooting.
+            return cached
+        raise
+
+    tsql_statement = response['Body'].read().decode('utf-8').strip()
+    entry = analyze_tsql_statement(tsql_statement, response['ETag'])
+    tsql_statement_cache[cache_key] = entry
+    print(f"In get_tsql_statement cached {file_key} (ETag {response['ETag']}).") #For troubleshooting.
+    return entry
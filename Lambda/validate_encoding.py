@@ -0,0 +1,120 @@
+import codecs
+import re
+import threading
+import boto3
+
+s3_client = boto3.client("s3")
+
+# Bytes read from S3 per chunk. Each chunk is decoded and dropped before the next one is read.
+ENCODING_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Only the issues at the lowest byte offsets are kept for the report; the rest are only counted.
+MAX_REPORTED_ISSUES = 1000
+
+# C0 control characters (except tab, line feed and carriage return) and DEL.
+CONTROL_CHARACTER_PATTERN = re.compile(rb"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+CONTROL_CHARACTER_BYTES = bytes([*range(0x00, 0x09), 0x0b, 0x0c, *range(0x0e, 0x20), 0x7f])
+
+ERROR_HANDLER_NAME = "record_invalid_utf8"
+
+# The codec error handler is process-wide, so it is registered once and hands each error to the scan
+# running on the current thread (see find_encoding_issues).
+current_scan = threading.local()
+
+
+def record_invalid_utf8(error):
+    """Codec error handler: passes the error to the current scan's recorder and skips the invalid bytes."""
+    return current_scan.recorder(error)
+
+
+codecs.register_error(ERROR_HANDLER_NAME, record_invalid_utf8)
+
+
+def get_line_and_column(chunk, chunk_offset, position, line_number, line_start_offset):
+    """
+    Returns the 1-based line and byte column of the absolute byte 'position'.
+    line_number and line_start_offset describe the line that was open at the start of the chunk.
+    """
+    relative_position = max(position - chunk_offset, 0)
+    line = line_number + chunk.count(b"\n", 0, relative_position)
+    last_newline = chunk.rfind(b"\n", 0, relative_position)
+    current_line_start = chunk_offset + last_newline + 1 if last_newline != -1 else line_start_offset
+    return line, position - current_line_start + 1
+
+
+def find_encoding_issues(body, chunk_size=ENCODING_CHUNK_SIZE, max_reported=MAX_REPORTED_ISSUES):
+    """
+    Scans a byte stream for invalid UTF-8 sequences and control characters without decoding the whole file.
+
+    Each chunk is checked with an incremental UTF-8 decoder (so sequences split across chunks are handled)
+    and for control characters; both checks run in C, and the per-issue bookkeeping only runs when something is found.
+
+    :param body: botocore StreamingBody (anything with iter_chunks).
+    :return: Dictionary with 'Issues' (list of dictionaries with Line, Column, Byte Offset, Value and Issue),
+             'Issue Count' and 'Bytes Scanned'.
+    """
+    issues = []
+    issue_count = 0
+    # Once more than max_reported issues were seen, the largest byte offset still kept; later issues past it are only counted.
+    cutoff_offset = None
+    chunk = b""
+    chunk_offset = 0
+    line_number = 1
+    line_start_offset = 0
+
+    def add_issue(position, value, issue):
+        nonlocal issue_count
+        issue_count += 1
+        if cutoff_offset is None or position < cutoff_offset:
+            line, column = get_line_and_column(chunk, chunk_offset, position, line_number, line_start_offset)
+            issues.append({"Line": line, "Column": column, "Byte Offset": position, "Value": value, "Issue": issue})
+
+    def record_error(error):
+        # error.object is the decoder's pending bytes plus the current chunk.
+        object_offset = chunk_offset - (len(error.object) - len(chunk))
+        bad_bytes = error.object[error.start:error.end]
+        add_issue(object_offset + error.start, bad_bytes.hex(" ").upper(), f"Invalid UTF-8 ({error.reason})")
+        return "", error.end
+
+    current_scan.recorder = record_error
+    decoder = codecs.getincrementaldecoder("utf-8")(ERROR_HANDLER_NAME)
+
+    try:
+        for chunk in body.iter_chunks(chunk_size):
+            decoder.decode(chunk)
+            # bytes.translate is several times faster than the regex, so only search chunks that have a control character.
+            if len(chunk.translate(None, CONTROL_CHARACTER_BYTES)) != len(chunk):
+                for match in CONTROL_CHARACTER_PATTERN.finditer(chunk):
+                    add_issue(chunk_offset + match.start(), match.group().hex().upper(), "Control Character")
+
+            newline_count = chunk.count(b"\n")
+            if newline_count:
+                line_number += newline_count
+                line_start_offset = chunk_offset + chunk.rfind(b"\n") + 1
+            chunk_offset += len(chunk)
+
+            # Issues of one chunk are not found in offset order, so sort before dropping the extra ones.
+            if len(issues) > max_reported:
+                issues.sort(key=lambda item: item["Byte Offset"])
+                del issues[max_reported:]
+                cutoff_offset = issues[-1]["Byte Offset"]
+
+        # Flush an incomplete sequence at the end of the file.
+        chunk = b""
+        decoder.decode(b"", final=True)
+    finally:
+        current_scan.recorder = None
+
+    issues.sort(key=lambda item: item["Byte Offset"])
+    del issues[max_reported:]
+    return {"Issues": issues, "Issue Count": issue_count, "Bytes Scanned": chunk_offset}
+
+
+def validate_file_encoding(bucket_name, file_key):
+    """Streams an S3 object through find_encoding_issues and returns its report."""
+    file_key = file_key.replace("+", " ")
+    print(f"In validate_file_encoding for {file_key}.") #For troubleshooting.
+    response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
+    report = find_encoding_issues(response['Body'])
+    print(f"In validate_file_encoding scanned {report['Bytes Scanned']} bytes and found {report['Issue Count']} issues.") #For troubleshooting.
+    return report
@@ -1,29 +1,12 @@
 import boto3
-import pyodbc
 import csv
 import os
 from parse_filename import parse_filename
-from build_tsql_from_tags import build_tsql_from_tags
+from build_tsql_from_tags import get_expected_headers_from_tags
 from get_tags_from_file import get_tags_from_file
-from add_tags_to_s3_object import add_tags_to_s3_object
+from object_session import get_object_head, set_object_tags
 from generate_validation_file import generate_header_validation_file
 
-# Connection string for SQL Server using ODBC Driver 18
-server = '10.0.151.32'
-database = 'Hacienda_ERP_Test'
-username = 'lambda_functions'
-password = 'coPPer873'
-port = '1433'  # Default port is 1433 for SQL Server
-
-connection_string = (
-    f'DRIVER={{ODBC Driver 18 for SQL Server}};'
-    f'SERVER={server},{port};'
-    f'DATABASE={database};'
-    f'UID={username};'
-    f'PWD={password};'
-    f'TrustServerCertificate=yes'
-)
-
 # Define query to fetch expected column headers
 #TSQL_QUERY = ""
 #TSQL_QUERY = "SELECT value AS ColumnTitle FROM SETUP_FILE_COLUMN_NAMES_MOCK8 CROSS APPLY STRING_SPLIT(columntitleline, ',') WHERE Table_name = 'SCM_SUPPLIER_MOCK8_PRIFAS'"
@@ -47,24 +30,6 @@ def get_csv_headers_from_s3(bucket_name, file_key):
     return headers
 
 
-def get_headers_from_db(tsql_query):
-    """Retrieve column headers from SQL Server using a T-SQL query."""
-    #connection_string = f"DRIVER={DB_DRIVER};SERVER={DB_SERVER};DATABASE={DB_NAME};UID={DB_USERNAME};PWD={DB_PASSWORD}"
-    print("entered get_headers_from_db")
-    print("in get_headers_from_db tsql_query = ", tsql_query) #for troubleshooting
-    try:
-        conn = pyodbc.connect(connection_string)
-        cursor = conn.cursor()
-        #print(tsql_query) #For troubleshooting
-        cursor.execute(tsql_query)
-        db_headers = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return db_headers
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return []
-
-
 def compare_headers(csv_headers, db_headers):
     """Compare headers and generate the output list."""
     max_length = max(len(csv_headers), len(db_headers))
@@ -133,9 +98,9 @@ def ValidateHeaders(bucket_name, file_key):
     print("In ValidateHeaders bucket name ", bucket_name) #For troubleshooting
     print("In ValidateHeaders file key ", file_key) #For troubleshooting
     csv_headers = get_csv_headers_from_s3(bucket_name, file_key)
-    tsql_query = build_tsql_from_tags(bucket_name, file_key)
-    print("in ValidateHeaders tsql_query = ", tsql_query) #for troubleshooting
-    db_headers = get_headers_from_db(tsql_query)
+    #Expected headers come from the cached setup metadata instead of a query per file.
+    db_headers = get_expected_headers_from_tags(bucket_name, file_key)
+    print("in ValidateHeaders db_headers = ", db_headers) #for troubleshooting
 
     if not csv_headers or not db_headers:
         return {"status": "error", "message": "Failed to retrieve headers"}
@@ -150,10 +115,10 @@ def ValidateHeaders(bucket_name, file_key):
         print(f"In Validate_Headers Errors and Warnings tag value for file {file_key} are: {parent_tags.get('Errors and Warnings')}")
         if parent_tags.get('Errors and Warnings'):
             parent_tags["Errors and Warnings"] = f"{parent_tags.get('Errors and Warnings')} - Valid Headers: Fail"
-            add_tags_to_s3_object(bucket_name, file_key, parent_tags)
+            set_object_tags(bucket_name, file_key, parent_tags)
         else:
             parent_tags["Errors and Warnings"] = "Valid Headers: Fail"
-            add_tags_to_s3_object(bucket_name, file_key, parent_tags)
+            set_object_tags(bucket_name, file_key, parent_tags)
 
         #Get only the parent file name without the folder and subfolders.
         parent_file_name = file_key.split('/')[-1]
@@ -165,7 +130,7 @@ def ValidateHeaders(bucket_name, file_key):
         print(f"Tags after updating Header Validation {parent_tags}") #for troubleshooting
 
         # Get the file_key last modified date and time and apply formatting.
-        response = s3.head_object(Bucket=bucket_name, Key=file_key)
+        response = get_object_head(bucket_name, file_key)
         last_modified = response["LastModified"]  
         last_modified_formatted = last_modified.strftime("%m_%d_%Y %I_%M_%p").lower()  # Format
         
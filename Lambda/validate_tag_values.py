@@ -1,4 +1,4 @@
-from execute_tsql import execute_tsql
+from setup_metadata_cache import find_plan_row_by_filename, find_plan_row_by_table_name
 
 def validate_tag_values(tags: dict) -> dict:
     """
@@ -36,30 +36,21 @@ def validate_tag_values(tags: dict) -> dict:
         # Construct expected tag value
         #expected_value = f"{pillar}_{data_entity}_{mock_number}_{source}"
         
-        # Construct SQL query
+        # Look up the plan row in the cached snapshot of the setup table (see setup_metadata_cache).
         if category == "Load":
-            tsql_query = (
-                #f"SELECT TOP 1 1 FROM {table_name} WHERE file_name = '{expected_value}';"
-                f"SELECT * FROM {table_name} WHERE table_name = '{file_name}' and EntityOnFileStructure is not null;"
-            )
+            #Plan row by table_name, only if EntityOnFileStructure is set.
+            print(f"Looking up {file_name} by table_name in {table_name}")
+            result = find_plan_row_by_table_name(mock_number, file_name, loadable_only=True)
         
         else:
-            tsql_query = (
-                #f"SELECT TOP 1 1 FROM {table_name} WHERE file_name = '{expected_value}';"
-                f"SELECT * FROM {table_name} WHERE filename = '{file_name}';"
-            )
+            #Plan row by filename.
+            print(f"Looking up {file_name} by filename in {table_name}")
+            result = find_plan_row_by_filename(mock_number, file_name)
 
-        print(f"Going to run query: {tsql_query}")
-        
-        # Execute query
-        result = execute_tsql(tsql_query)
         print(f"SQL Results: {result}")
         
-        # Handle different return types
-        if isinstance(result, list) and result:  # If it's a non-empty list, return the first record
-            return result[0]  # Return first dictionary from the list
-        else:
-            return {}  # Return empty dictionary if no records are found
+        # Return the plan row, or an empty dictionary if no records are found
+        return result or {}
     
     except Exception as e:
         print(f"Error in validate_tags: {str(e)}")
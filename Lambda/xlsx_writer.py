@@ -0,0 +1,36 @@
+from openpyxl import Workbook
+
+# Rows converted from the DataFrame at a time; bounds the temporary row lists regardless of frame size.
+XLSX_ROW_CHUNK_SIZE = 10000
+
+
+def write_rows_to_xlsx(output, rows, header=None, sheet_title="Sheet1"):
+    """
+    Streams rows into a single-sheet Excel workbook using openpyxl write-only mode.
+
+    Write-only worksheets serialize each row as it is appended instead of building a cell object
+    graph, so memory use does not grow with the number of rows.
+
+    :param output: File path or binary file-like object to save the workbook to.
+    :param rows: Iterable of row lists/tuples. None values become empty cells.
+    :param header: Optional list of column titles written as the first row.
+    :param sheet_title: Worksheet name.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=sheet_title)
+    if header is not None:
+        sheet.append(list(header))
+    for row in rows:
+        sheet.append(row)
+    workbook.save(output)
+
+
+def iter_frame_rows(df, chunk_size=XLSX_ROW_CHUNK_SIZE):
+    """Yields the rows of a DataFrame as lists with missing values (NaN/NA) replaced by None."""
+    for start in range(0, len(df), chunk_size):
+        yield from df.iloc[start:start + chunk_size].to_numpy(dtype=object, na_value=None).tolist()
+
+
+def write_frame_to_xlsx(df, output, sheet_title="Sheet1"):
+    """Writes a DataFrame (header row plus values, no index) to an Excel workbook in constant memory."""
+    write_rows_to_xlsx(output, iter_frame_rows(df), header=[str(column) for column in df.columns], sheet_title=sheet_title)
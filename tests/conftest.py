@@ -0,0 +1,80 @@
+import os
+import sys
+import types
+import pytest
+
+# The Lambda modules import each other by plain name, as they do inside the deployment package.
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Lambda")
+sys.path.insert(0, LAMBDA_DIR)
+
+# Module-level boto3 clients need a region; nothing in the tests calls AWS.
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+
+# pyodbc needs the SQL Server ODBC driver, which is only installed in the Lambda image. Without it the
+# tests use a stand-in that can be imported but never connects; database code runs against sqlite3 or
+# the recording connection below instead.
+try:
+    import pyodbc  # noqa: F401
+except ImportError:
+    pyodbc_stub = types.ModuleType("pyodbc")
+
+    class Error(Exception):
+        pass
+
+    def connect(*args, **kwargs):
+        raise Error("pyodbc is not installed; the tests must not open a SQL Server connection.")
+
+    pyodbc_stub.Error = Error
+    pyodbc_stub.connect = connect
+    sys.modules["pyodbc"] = pyodbc_stub
+
+
+class RecordingCursor:
+    """DB-API cursor that records every statement. fail_on makes the first statement containing it raise."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = 0
+
+    def execute(self, statement, params=None):
+        self.connection.log.append(("execute", statement, params))
+        if self.connection.fail_on and self.connection.fail_on in statement:
+            raise RuntimeError(f"Failed on {self.connection.fail_on}")
+        self.rowcount = self.connection.rowcount
+
+    def executemany(self, statement, rows):
+        self.connection.log.append(("executemany", statement, list(rows)))
+
+    def close(self):
+        pass
+
+
+class RecordingConnection:
+    """DB-API connection standing in for pyodbc; see RecordingCursor."""
+
+    def __init__(self, fail_on=None, rowcount=0):
+        self.log = []
+        self.fail_on = fail_on
+        self.rowcount = rowcount
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.log.append(("commit",))
+
+    def rollback(self):
+        self.log.append(("rollback",))
+
+    def statements(self):
+        return [entry[1] for entry in self.log if entry[0] in ("execute", "executemany")]
+
+    def events(self):
+        """Statement verbs and transaction calls in order, e.g. ["SELECT", "INSERT", "commit"]."""
+        return [entry[1].split()[0] if len(entry) > 1 else entry[0] for entry in self.log]
+
+
+@pytest.fixture
+def recording_connection():
+    """Factory for RecordingConnection."""
+    return RecordingConnection
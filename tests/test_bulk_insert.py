@@ -0,0 +1,95 @@
+import sqlite3
+import pytest
+from bulk_insert import (FAST_EXECUTEMANY, TABLE_VALUED_PARAMETER, MULTI_ROW_VALUES, MIN_BATCH_ROWS, MAX_BATCH_ROWS,
+                         MAX_PARAMS_PER_STATEMENT, SMALL_LOAD_ROWS, TVP_MIN_ROWS, get_batch_size,
+                         choose_bulk_insert_strategy, bulk_insert)
+from parse_tsql_statement import parse_insert_statement
+
+STATEMENT = "INSERT INTO SUPPLIER (ID, NAME, CITY) VALUES (?, ?, ?)"
+TVP_STATEMENT = "-- TVP: dbo.SupplierRows\n" + STATEMENT
+
+
+@pytest.fixture
+def sqlite_connection():
+    cnxn = sqlite3.connect(":memory:")
+    cnxn.execute("CREATE TABLE SUPPLIER (ID TEXT, NAME TEXT, CITY TEXT)")
+    yield cnxn
+    cnxn.close()
+
+
+def make_rows(count):
+    return [(str(number), f"Supplier {number}", "Reno") for number in range(count)]
+
+
+def test_batch_size_is_bounded_by_cell_count():
+    assert get_batch_size(1) == MAX_BATCH_ROWS
+    assert get_batch_size(0) == MAX_BATCH_ROWS
+    assert get_batch_size(50) == 10000
+    assert get_batch_size(5000) == MIN_BATCH_ROWS
+
+
+def test_strategy_selection():
+    statement_info = parse_insert_statement(STATEMENT)
+    tvp_statement_info = parse_insert_statement(TVP_STATEMENT)
+
+    assert choose_bulk_insert_strategy(SMALL_LOAD_ROWS, 3, statement_info) == MULTI_ROW_VALUES
+    assert choose_bulk_insert_strategy(SMALL_LOAD_ROWS, MAX_PARAMS_PER_STATEMENT + 1, statement_info) == FAST_EXECUTEMANY
+    assert choose_bulk_insert_strategy(SMALL_LOAD_ROWS + 1, 3, statement_info) == FAST_EXECUTEMANY
+    assert choose_bulk_insert_strategy(TVP_MIN_ROWS, 3, tvp_statement_info) == TABLE_VALUED_PARAMETER
+    assert choose_bulk_insert_strategy(TVP_MIN_ROWS - 1, 3, tvp_statement_info) == FAST_EXECUTEMANY
+    # A statement that is not a simple INSERT ... VALUES can only be run as written.
+    assert choose_bulk_insert_strategy(10, 3, {}) == FAST_EXECUTEMANY
+
+
+@pytest.mark.parametrize("row_count, strategy", [(10, MULTI_ROW_VALUES), (2500, FAST_EXECUTEMANY)])
+def test_bulk_insert_into_sqlite(sqlite_connection, row_count, strategy):
+    rows = make_rows(row_count)
+
+    stats = bulk_insert(sqlite_connection, STATEMENT, rows)
+    sqlite_connection.commit()
+
+    assert stats["strategy"] == strategy
+    assert stats["rows"] == row_count
+    assert stats["rows_per_second"] > 0
+    assert sqlite_connection.execute("SELECT ID, NAME, CITY FROM SUPPLIER ORDER BY rowid").fetchall() == rows
+
+
+def test_forced_strategy_and_cached_statement_info(sqlite_connection):
+    rows = make_rows(5)
+
+    stats = bulk_insert(sqlite_connection, STATEMENT, rows, strategy=FAST_EXECUTEMANY,
+                        statement_info=parse_insert_statement(STATEMENT))
+
+    assert stats["strategy"] == FAST_EXECUTEMANY
+    assert sqlite_connection.execute("SELECT COUNT(*) FROM SUPPLIER").fetchone()[0] == 5
+
+
+def test_bulk_insert_does_not_commit(sqlite_connection):
+    bulk_insert(sqlite_connection, STATEMENT, make_rows(3))
+    sqlite_connection.rollback()
+
+    assert sqlite_connection.execute("SELECT COUNT(*) FROM SUPPLIER").fetchone()[0] == 0
+
+
+def test_multi_row_values_stay_under_the_parameter_limit(recording_connection):
+    cnxn = recording_connection()
+
+    bulk_insert(cnxn, STATEMENT, make_rows(SMALL_LOAD_ROWS), strategy=MULTI_ROW_VALUES)
+
+    params = [entry[2] for entry in cnxn.log]
+    assert all(len(statement_params) <= MAX_PARAMS_PER_STATEMENT for statement_params in params)
+    assert sum(len(statement_params) for statement_params in params) == SMALL_LOAD_ROWS * 3
+
+
+def test_table_valued_parameter_batches(recording_connection):
+    cnxn = recording_connection()
+    rows = make_rows(TVP_MIN_ROWS)
+
+    stats = bulk_insert(cnxn, TVP_STATEMENT, rows)
+
+    assert stats["strategy"] == TABLE_VALUED_PARAMETER
+    statement = cnxn.statements()[0]
+    assert statement.startswith("INSERT INTO SUPPLIER  (ID, NAME, CITY) SELECT * FROM ?")
+    tvps = [entry[2][0] for entry in cnxn.log]
+    assert all(tvp[:2] == ["SupplierRows", "dbo"] for tvp in tvps)
+    assert [row for tvp in tvps for row in tvp[2:]] == rows
@@ -0,0 +1,65 @@
+from load_checkpoint import (DEADLINE_MARGIN_MS, LOAD_PROGRESS_TABLE, build_load_checkpoint, update_load_checkpoint,
+                             get_checkpoint_header, get_load_progress_key, is_deadline_near, save_load_checkpoint)
+
+
+class FakeContext:
+    """Stands in for the Lambda context."""
+
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+def test_deadline_without_a_context_is_never_near():
+    assert is_deadline_near(None, slowest_batch_ms=10 ** 9) is False
+
+
+def test_deadline_leaves_the_margin_plus_the_slowest_batch():
+    assert is_deadline_near(FakeContext(DEADLINE_MARGIN_MS + 5000), slowest_batch_ms=4999) is False
+    assert is_deadline_near(FakeContext(DEADLINE_MARGIN_MS + 5000), slowest_batch_ms=5001) is True
+    assert is_deadline_near(FakeContext(DEADLINE_MARGIN_MS - 1)) is True
+
+
+def test_update_accumulates_rows_and_moves_the_offset():
+    checkpoint = build_load_checkpoint("bucket", "ConversionFiles/a.csv", '"etag"', 100, b"", 0, 0)
+
+    update_load_checkpoint(checkpoint, b"ID,NAME\n", 40, 3)
+    update_load_checkpoint(checkpoint, b"ID,NAME\n", 90, 4)
+
+    assert (checkpoint["Offset"], checkpoint["Rows Committed"]) == (90, 7)
+    assert get_checkpoint_header(checkpoint) == b"ID,NAME\n"
+
+
+def test_header_read_back_from_the_database_is_bytes():
+    checkpoint = build_load_checkpoint("bucket", "key", '"etag"', 100, bytearray(b"ID\n"), 10, 1)
+
+    assert get_checkpoint_header(checkpoint) == b"ID\n"
+
+
+def test_progress_key_fits_the_key_column():
+    key = get_load_progress_key("bucket", "ConversionFiles/" + "x" * 900 + ".csv")
+
+    assert len(key) == 40
+    assert key != get_load_progress_key("bucket", "ConversionFiles/other.csv")
+
+
+def test_save_updates_the_progress_row(recording_connection):
+    cnxn = recording_connection(rowcount=1)
+    checkpoint = build_load_checkpoint("bucket", "key", '"etag"', 100, b"ID\n", 10, 1)
+
+    save_load_checkpoint(cnxn.cursor(), checkpoint)
+
+    assert cnxn.events() == ["UPDATE"]
+    assert cnxn.log[0][2] == ('"etag"', b"ID\n", 10, 1, get_load_progress_key("bucket", "key"))
+
+
+def test_save_inserts_the_first_progress_row_without_committing(recording_connection):
+    cnxn = recording_connection(rowcount=0)
+    checkpoint = build_load_checkpoint("bucket", "key", '"etag"', 100, b"ID\n", 10, 1)
+
+    save_load_checkpoint(cnxn.cursor(), checkpoint)
+
+    assert cnxn.events() == ["UPDATE", "INSERT"]
+    assert cnxn.statements()[1].startswith(f"INSERT INTO {LOAD_PROGRESS_TABLE} ")
@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+import pytest
+import load_file
+from load_checkpoint import build_load_checkpoint
+from stream_csv import iter_csv_record_batches, parse_csv_batch
+from tsql_statement_cache import analyze_tsql_statement
+
+STATEMENT = "INSERT INTO SUPPLIER (ID, NAME) VALUES (?, ?)"
+
+
+class FakeBody:
+    """Stands in for a botocore StreamingBody."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+@pytest.fixture
+def streamed_load(monkeypatch, recording_connection):
+    """Runs load_row_batches over a CSV against a recording connection; returns (result, connection, errors)."""
+    def run(data, statement=STATEMENT, fail_on=None):
+        cnxn = recording_connection(fail_on=fail_on, rowcount=1)
+        errors = []
+
+        @contextmanager
+        def database_connection():
+            yield cnxn
+
+        monkeypatch.setattr(load_file, "database_connection", database_connection)
+        monkeypatch.setattr(load_file, "write_insert_rows_error", lambda bucket, key, error: errors.append(("insert", str(error))))
+        monkeypatch.setattr(load_file, "write_param_count_error", lambda *args: errors.append(("param count",)))
+        monkeypatch.setattr(load_file, "handle_csv_read_error", lambda s3, bucket, key, error: errors.append(("csv", str(error))))
+
+        record_batches = iter_csv_record_batches(FakeBody(data), batch_size=2, chunk_size=8)
+        first_batch = next(record_batches, None)
+        first_rows = parse_csv_batch(first_batch[0], first_batch[1]) if first_batch else []
+        checkpoint = build_load_checkpoint("bucket", "ConversionFiles/a.csv", '"etag"', len(data), b"", 0, 0)
+        result = load_file.load_row_batches(None, analyze_tsql_statement(statement, '"tsql"'), first_batch, first_rows,
+                                            record_batches, checkpoint, "bucket", "ConversionFiles/a.csv")
+        return result, cnxn, errors
+    return run
+
+
+CSV_BYTES = b"ID,NAME\n1,A\n2,B\n3,C\n"
+
+
+def test_each_staged_batch_commits_with_its_checkpoint(streamed_load):
+    result, cnxn, errors = streamed_load(CSV_BYTES)
+
+    assert result is True and errors == []
+    assert cnxn.events() == [
+        "IF", "IF", "SELECT", "UPDATE", "commit",   # progress table, empty staging table, first checkpoint
+        "INSERT", "UPDATE", "commit",               # batch 1 with its checkpoint
+        "INSERT", "UPDATE", "commit",               # batch 2 with its checkpoint
+        "INSERT", "IF", "DELETE", "commit",         # switch-in, staging drop and progress delete together
+    ]
+
+
+def test_failed_batch_discards_the_staged_rows(streamed_load):
+    result, cnxn, errors = streamed_load(CSV_BYTES, fail_on="VALUES (?, ?)")
+
+    assert result is None
+    assert errors == [("insert", "Failed on VALUES (?, ?)")]
+    assert not any(statement.startswith("INSERT INTO SUPPLIER") for statement in cnxn.statements())
+    assert cnxn.events()[-3:] == ["IF", "DELETE", "commit"]
+
+
+def test_param_count_mismatch_loads_nothing(streamed_load):
+    result, cnxn, errors = streamed_load(b"ID,NAME,CITY\n1,A,Reno\n")
+
+    assert result is None
+    assert errors == [("param count",)]
+    assert cnxn.log == []
+
+
+def test_unparseable_statement_loads_in_one_transaction(streamed_load):
+    result, cnxn, errors = streamed_load(CSV_BYTES, statement="EXEC dbo.LoadSupplier ?, ?")
+
+    assert result is True and errors == []
+    assert cnxn.events() == ["EXEC", "EXEC", "commit"]
+    assert [entry[0] for entry in cnxn.log] == ["executemany", "executemany", "commit"]
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+from partition_spec import (MISSING_PARTITION_VALUE, parse_partition_spec, compute_partition_keys,
+                            build_partition_output_key)
+
+
+def test_single_column_keeps_the_original_five_character_split():
+    assert parse_partition_spec("BUSINESS_UNIT") == [
+        {"Column": "BUSINESS_UNIT", "Kind": "prefix", "Length": 5, "Label": "BU"}
+    ]
+
+
+def test_levels_with_expressions():
+    levels = parse_partition_spec(" BUSINESS_UNIT:prefix=3, ACCOUNTING_DT:Month ,LEDGER:value,")
+
+    assert [(level["Column"], level["Kind"], level["Length"], level["Label"]) for level in levels] == [
+        ("BUSINESS_UNIT", "prefix", 3, "BU"),
+        ("ACCOUNTING_DT", "month", 5, "ACCOUNTING_DT"),
+        ("LEDGER", "value", 5, "LEDGER"),
+    ]
+
+
+def test_unknown_expression_raises():
+    with pytest.raises(ValueError):
+        parse_partition_spec("BUSINESS_UNIT:weekday")
+
+
+def test_partition_keys_per_level():
+    df = pd.DataFrame({
+        "BUSINESS_UNIT": ["US001X", "MX002", None],
+        "ACCOUNTING_DT": ["2024-01-15", "not a date", "2024-05-02"],
+    }, dtype=str)
+
+    keys = compute_partition_keys(df, parse_partition_spec("BUSINESS_UNIT, ACCOUNTING_DT:month"))
+
+    assert [key.name for key in keys] == ["BU", "ACCOUNTING_DT"]
+    assert keys[0].tolist() == ["US001", "MX002", MISSING_PARTITION_VALUE]
+    assert keys[1].tolist() == ["2024-01", MISSING_PARTITION_VALUE, "2024-05"]
+
+
+def test_quarter_and_value_keys():
+    df = pd.DataFrame({"ACCOUNTING_DT": ["2024-02-29", "2024-11-01"], "LEDGER": ["ACTUALS", None]}, dtype=str)
+
+    quarter, ledger = compute_partition_keys(df, parse_partition_spec("ACCOUNTING_DT:quarter, LEDGER:value"))
+
+    assert quarter.tolist() == ["2024Q1", "2024Q4"]
+    assert ledger.tolist() == ["ACTUALS", MISSING_PARTITION_VALUE]
+
+
+def test_output_key_for_one_and_two_levels():
+    one_level = parse_partition_spec("BUSINESS_UNIT")
+    two_levels = parse_partition_spec("BUSINESS_UNIT, ACCOUNTING_DT:month")
+
+    assert build_partition_output_key("DataValidation/1-Extracted", "data_file", one_level, ["US001"], ".xlsx") == \
+        "DataValidation/1-Extracted/data_file_BUUS001.xlsx"
+    assert build_partition_output_key("DataValidation/1-Extracted", "data_file", two_levels, ["US001", "2024-01"], ".csv.gz") == \
+        "DataValidation/1-Extracted/BUUS001/data_file_BUUS001_ACCOUNTING_DT2024-01.csv.gz"
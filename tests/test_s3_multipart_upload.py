@@ -0,0 +1,107 @@
+import threading
+import pytest
+from s3_multipart_upload import S3MultipartWriter
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+class FakeS3Client:
+    """Records the S3 calls an S3MultipartWriter makes. fail_part makes that part number raise."""
+
+    def __init__(self, fail_part=None):
+        self.calls = []
+        self.parts = {}
+        self.fail_part = fail_part
+        self.lock = threading.Lock()
+
+    def put_object(self, **kwargs):
+        self.calls.append(("put_object", kwargs))
+        return {"ETag": '"single"'}
+
+    def create_multipart_upload(self, **kwargs):
+        self.calls.append(("create_multipart_upload", kwargs))
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, PartNumber, Body, **kwargs):
+        if PartNumber == self.fail_part:
+            raise RuntimeError(f"Part {PartNumber} failed")
+        with self.lock:
+            self.parts[PartNumber] = Body
+        return {"ETag": f'"part-{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        self.calls.append(("complete_multipart_upload", kwargs))
+        return {"ETag": '"multipart"'}
+
+    def abort_multipart_upload(self, **kwargs):
+        self.calls.append(("abort_multipart_upload", kwargs))
+
+    def call_names(self):
+        return [name for name, _ in self.calls]
+
+
+def test_small_content_is_sent_with_one_put_object():
+    client = FakeS3Client()
+
+    with S3MultipartWriter("bucket", "key.csv", content_type="text/csv", tags={"BU": "US001"}, client=client) as writer:
+        writer.write(b"ID,NAME\n")
+        writer.write(b"1,A\n")
+
+    assert client.call_names() == ["put_object"]
+    put_args = client.calls[0][1]
+    assert put_args["Body"] == b"ID,NAME\n1,A\n"
+    assert put_args["ContentType"] == "text/csv"
+    assert put_args["Tagging"] == "BU=US001"
+    assert writer.response == {"ETag": '"single"'}
+
+
+def test_large_content_is_uploaded_in_ordered_parts():
+    client = FakeS3Client()
+    content = bytes(range(256)) * (PART_SIZE * 2 // 256 + 1000)
+
+    with S3MultipartWriter("bucket", "key.csv", part_size=PART_SIZE, max_workers=2, client=client) as writer:
+        for start in range(0, len(content), 100000):
+            writer.write(content[start:start + 100000])
+        assert writer.tell() == len(content)
+
+    assert client.call_names() == ["create_multipart_upload", "complete_multipart_upload"]
+    completed_parts = client.calls[1][1]["MultipartUpload"]["Parts"]
+    assert [part["PartNumber"] for part in completed_parts] == [1, 2, 3]
+    assert [part["ETag"] for part in completed_parts] == ['"part-1"', '"part-2"', '"part-3"']
+    assert [len(client.parts[number]) for number in (1, 2)] == [PART_SIZE, PART_SIZE]
+    assert b"".join(client.parts[number] for number in (1, 2, 3)) == content
+
+
+def test_part_size_has_the_s3_minimum():
+    assert S3MultipartWriter("bucket", "key", part_size=1024, client=FakeS3Client()).part_size == PART_SIZE
+
+
+def test_failed_part_aborts_the_upload():
+    client = FakeS3Client(fail_part=2)
+    writer = S3MultipartWriter("bucket", "key.csv", part_size=PART_SIZE, client=client)
+    writer.write(b"x" * (PART_SIZE * 2 + 10))
+
+    with pytest.raises(RuntimeError):
+        writer.close()
+
+    assert client.call_names() == ["create_multipart_upload", "abort_multipart_upload"]
+    assert writer.closed
+
+
+def test_exception_in_the_with_block_aborts_the_upload():
+    client = FakeS3Client()
+
+    with pytest.raises(ValueError):
+        with S3MultipartWriter("bucket", "key.csv", part_size=PART_SIZE, client=client) as writer:
+            writer.write(b"x" * (PART_SIZE + 1))
+            raise ValueError("Producer failed")
+
+    assert client.call_names() == ["create_multipart_upload", "abort_multipart_upload"]
+
+
+def test_write_after_close_raises():
+    writer = S3MultipartWriter("bucket", "key", client=FakeS3Client())
+    writer.close()
+
+    with pytest.raises(ValueError):
+        writer.write(b"late")
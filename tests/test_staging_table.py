@@ -0,0 +1,82 @@
+import pytest
+import staging_table
+from staging_table import (build_staging_table_name, build_load_staging_table_name, build_staging_insert_statement,
+                           drop_staging_table, staged_insert_rows)
+from parse_tsql_statement import parse_insert_statement
+
+STATEMENT = "INSERT INTO dbo.SUPPLIER (ID, NAME) VALUES (?, ?)"
+
+
+@pytest.fixture
+def pooled(monkeypatch, recording_connection):
+    """Hands out one recording connection from the pool and records how it was released."""
+    def make(fail_on=None):
+        cnxn = recording_connection(fail_on=fail_on, rowcount=2)
+        released = []
+        monkeypatch.setattr(staging_table, "get_connection", lambda connection_str: cnxn)
+        monkeypatch.setattr(staging_table, "release_connection",
+                            lambda connection_str, released_cnxn, broken=False: released.append(broken))
+        return cnxn, released
+    return make
+
+
+def test_staging_table_names():
+    assert build_staging_table_name("dbo.[SUPPLIER]", prefix="##").startswith("##SUPPLIER_STAGE_")
+    assert build_staging_table_name("SUPPLIER") != build_staging_table_name("SUPPLIER")
+
+    load_table = build_load_staging_table_name("bucket", "ConversionFiles/a.csv", '"etag1"')
+    assert load_table == build_load_staging_table_name("bucket", "ConversionFiles/a.csv", '"etag1"')
+    assert load_table != build_load_staging_table_name("bucket", "ConversionFiles/a.csv", '"etag2"')
+    assert load_table.startswith("LOAD_STAGE_") and len(load_table) == len("LOAD_STAGE_") + 20
+
+
+def test_staging_insert_statement():
+    statement_info = parse_insert_statement(STATEMENT)
+
+    assert build_staging_insert_statement(statement_info, "#S", "WITH (TABLOCK)") == \
+        "INSERT INTO #S WITH (TABLOCK) (ID, NAME) VALUES (?, ?)"
+
+
+def test_drop_staging_table_checks_tempdb_for_temp_tables(recording_connection):
+    cnxn = recording_connection()
+    cursor = cnxn.cursor()
+
+    drop_staging_table(cursor, "#S")
+    drop_staging_table(cursor, "LOAD_STAGE_1")
+
+    assert cnxn.statements() == [
+        "IF OBJECT_ID('tempdb..#S') IS NOT NULL DROP TABLE #S;",
+        "IF OBJECT_ID('LOAD_STAGE_1') IS NOT NULL DROP TABLE LOAD_STAGE_1;",
+    ]
+
+
+def test_staged_insert_switches_in_after_the_staged_rows_are_committed(pooled):
+    cnxn, released = pooled()
+
+    moved_rows = staged_insert_rows("connection", STATEMENT, [("1", "A"), ("2", "B")])
+
+    assert moved_rows == 2
+    assert cnxn.events() == ["SELECT", "INSERT", "commit", "INSERT", "commit", "IF", "commit"]
+    statements = cnxn.statements()
+    assert statements[0].startswith("SELECT TOP 0 ID, NAME INTO #SUPPLIER_STAGE_")
+    assert statements[2].startswith("INSERT INTO dbo.SUPPLIER WITH (TABLOCK) (ID, NAME) SELECT ID, NAME FROM #SUPPLIER_STAGE_")
+    assert released == [False]
+
+
+def test_failed_switch_in_rolls_back_and_drops_the_staging_table(pooled):
+    cnxn, released = pooled(fail_on="INSERT INTO dbo.SUPPLIER")
+
+    with pytest.raises(RuntimeError):
+        staged_insert_rows("connection", STATEMENT, [("1", "A")])
+
+    assert cnxn.events() == ["SELECT", "INSERT", "commit", "INSERT", "rollback", "IF", "commit"]
+    assert released == [True]
+
+
+def test_unparseable_statement_is_rejected(pooled):
+    cnxn, released = pooled()
+
+    with pytest.raises(ValueError):
+        staged_insert_rows("connection", "EXEC dbo.LoadSupplier ?, ?", [("1", "A")])
+
+    assert cnxn.log == []
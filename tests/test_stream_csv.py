@@ -0,0 +1,64 @@
+from stream_csv import iter_csv_record_batches, parse_csv_batch
+
+
+class FakeBody:
+    """Stands in for a botocore StreamingBody."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+HEADER = b"ID,NAME\n"
+RECORDS = [b"1,Alpha\n", b'2,"Line one\nline two"\n', b'3,"Comma, inside"\n', b"4,Delta\n", b"5,Echo\n"]
+CSV_BYTES = HEADER + b"".join(RECORDS)
+
+
+def test_batches_hold_whole_records_for_any_chunk_size():
+    for chunk_size in (1, 3, 7, 64):
+        batches = list(iter_csv_record_batches(FakeBody(CSV_BYTES), batch_size=2, chunk_size=chunk_size))
+
+        assert [header for header, _, _ in batches] == [HEADER] * 3
+        assert [batch for _, batch, _ in batches] == [RECORDS[0] + RECORDS[1], RECORDS[2] + RECORDS[3], RECORDS[4]]
+
+
+def test_end_offsets_are_absolute_byte_offsets():
+    batches = list(iter_csv_record_batches(FakeBody(CSV_BYTES), batch_size=2, chunk_size=5))
+
+    end_offsets = [end_offset for _, _, end_offset in batches]
+    assert end_offsets[-1] == len(CSV_BYTES)
+    for (_, batch, end_offset) in batches:
+        assert CSV_BYTES[end_offset - len(batch):end_offset] == batch
+
+
+def test_resume_from_an_end_offset_yields_the_remaining_records():
+    first_header, _, resume_offset = next(iter_csv_record_batches(FakeBody(CSV_BYTES), batch_size=2, chunk_size=4))
+
+    # A continuation reads the object from resume_offset (a ranged GET) with the saved header.
+    resumed = list(iter_csv_record_batches(FakeBody(CSV_BYTES[resume_offset:]), batch_size=2, chunk_size=4,
+                                           header=first_header, start_offset=resume_offset))
+
+    assert b"".join(batch for _, batch, _ in resumed) == b"".join(RECORDS[2:])
+    assert resumed[-1][2] == len(CSV_BYTES)
+    assert all(header == HEADER for header, _, _ in resumed)
+
+
+def test_last_record_without_a_newline_is_kept():
+    data = HEADER + b"1,Alpha\n2,Bravo"
+
+    batches = list(iter_csv_record_batches(FakeBody(data), batch_size=10, chunk_size=4))
+
+    assert batches == [(HEADER, b"1,Alpha\n2,Bravo", len(data))]
+
+
+def test_header_only_file_yields_nothing():
+    assert list(iter_csv_record_batches(FakeBody(HEADER), batch_size=2)) == []
+
+
+def test_parse_csv_batch_returns_strings_with_empty_missing_values():
+    rows = parse_csv_batch(HEADER, b'1,\n2,"Line one\nline two"\n007,Zero\n')
+
+    assert rows == [["1", ""], ["2", "Line one\nline two"], ["007", "Zero"]]
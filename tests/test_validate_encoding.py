@@ -0,0 +1,69 @@
+import codecs
+from validate_encoding import ERROR_HANDLER_NAME, find_encoding_issues
+
+
+class FakeBody:
+    """Stands in for a botocore StreamingBody."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunks(self, chunk_size):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+
+def scan(data, chunk_size=4, max_reported=100):
+    return find_encoding_issues(FakeBody(data), chunk_size=chunk_size, max_reported=max_reported)
+
+
+def test_clean_utf8_has_no_issues():
+    data = "ID,NAME\n1,Peña\n2,€uro\n".encode("utf-8")
+
+    # Small chunks split the multi-byte characters across chunks.
+    report = scan(data, chunk_size=1)
+
+    assert report == {"Issues": [], "Issue Count": 0, "Bytes Scanned": len(data)}
+
+
+def test_invalid_bytes_and_control_characters_are_located():
+    data = b"ID,NAME\n1,Ok\n2,Bad\xffvalue\x01\n"
+
+    report = scan(data)
+
+    assert report["Issue Count"] == 2
+    assert [(issue["Line"], issue["Column"], issue["Byte Offset"], issue["Value"]) for issue in report["Issues"]] == [
+        (3, 6, 18, "FF"),
+        (3, 12, 24, "01"),
+    ]
+    assert report["Issues"][0]["Issue"].startswith("Invalid UTF-8")
+    assert report["Issues"][1]["Issue"] == "Control Character"
+
+
+def test_truncated_sequence_at_the_end_of_the_file():
+    data = b"A,B\n1,\xe2\x82"
+
+    report = scan(data, chunk_size=5)
+
+    assert report["Issue Count"] == 1
+    assert report["Issues"][0]["Byte Offset"] == 6
+    assert report["Issues"][0]["Value"] == "E2 82"
+
+
+def test_report_keeps_the_earliest_issues_when_truncated():
+    # Within each chunk the invalid bytes are found before the control characters that precede them.
+    data = b"\x01\xff\x02\xfe" * 10
+
+    report = scan(data, chunk_size=8, max_reported=5)
+
+    assert report["Issue Count"] == 40
+    assert [issue["Byte Offset"] for issue in report["Issues"]] == [0, 1, 2, 3, 4]
+
+
+def test_error_handler_is_registered_once():
+    handler = codecs.lookup_error(ERROR_HANDLER_NAME)
+
+    scan(b"\xff\x01")
+    scan(b"\xfe")
+
+    assert codecs.lookup_error(ERROR_HANDLER_NAME) is handler